@@ -1,13 +1,40 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import (
+    Blueprint, Flask, Response, abort, before_render_template, flash, g, has_request_context, jsonify,
+    redirect, render_template, request, session, template_rendered, url_for,
+)
+from markupsafe import Markup
+from werkzeug.local import LocalProxy
+from werkzeug.middleware.proxy_fix import ProxyFix
+import atexit
+import hashlib
+import json
+import math
+import os
 import random
 import secrets
 import time
 
+from events import EventLog
+from leaderboard import make_leaderboard
+from live import LiveFeed
+from metrics import Counter, Histogram, WorkerDump, collect_local, render as render_metrics
+from pagecache import PageCache, respond
+from puzzle_store import make_puzzle_store
+from puzzles import PuzzleBank, parse_weights
+from ratelimit import SlidingWindow, TokenBucket, make_limiter
+from rooms import DEFAULT_ROOM, Room, RoomPuzzles, RoomRegistry, RoomsFull, valid_room_id
+from sessions import make_session_interface, regenerate
+from state_store import MemoryStore, make_store
+
 app = Flask(__name__)
+# static URLs carry a content hash (?v=...), so browsers may keep the files for a year
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 365 * 24 * 60 * 60
 app.secret_key = "super_secret_key"
 
 # ======= GLOBAL STATE =======
-STATE = {
+# Defaults only: the live values sit in each room's store (a state_store backend)
+# so every gunicorn worker sees the same game. Pick the backend with STATE_BACKEND.
+DEFAULT_STATE = {
     "detection": 0,
     "max_detection": 5,
     "files": 0,
@@ -18,13 +45,38 @@ STATE = {
 }
 
 DEFENSE_REDUCTION_MULTIPLIER = 0.5
-
-# Per-defense hack attempt logs
-DEFENSE_LOGS = {
-    "wires":   {"success": 0, "fail": 0},
-    "keypad":  {"success": 0, "fail": 0},
-    "firewall":{"success": 0, "fail": 0},
-}
+# Economy knobs (simulate.py sweeps these)
+TRACED_PENALTY_GB = 12              # taken when a hack hits max detection
+CANCEL_DETECTION_PENALTY_GB = 100   # taken when the defender cancels a full detection
+BOOST_HACKS = 8                     # hacks an Increase Defense lasts
+REROLL_COST = 1
+COOLDOWN_COST = 5
+
+# Per-defense hack attempt logs (stored as "log:<defense>:success|fail" counters)
+DEFENSES = ("wires", "keypad", "firewall")
+for _d in DEFENSES:
+    DEFAULT_STATE[f"log:{_d}:success"] = 0
+    DEFAULT_STATE[f"log:{_d}:fail"] = 0
+
+BASE_STORE = make_store()
+
+# Optional event log: EVENT_LOG_DIR=/var/data/events keeps progress across restarts.
+# Only for the in-memory backend (sqlite/redis persist on their own), one process per dir.
+EVENT_LOG_DIR = os.environ.get("EVENT_LOG_DIR")
+EVENTS = None
+
+def event_cause():
+    """Short tag for what made a change, e.g. 'hack:submit' or 'api.api_sell'."""
+    if not has_request_context():
+        return "system"
+    action = (request.view_args or {}).get("action") or request.form.get("action")
+    return f"{request.endpoint}:{action}" if action else str(request.endpoint)
+
+if EVENT_LOG_DIR:
+    if not isinstance(BASE_STORE, MemoryStore):
+        raise RuntimeError("EVENT_LOG_DIR only works with STATE_BACKEND=memory")
+    EVENTS = EventLog(EVENT_LOG_DIR)
+    atexit.register(EVENTS.close)
 
 FILE_POOL = [
     ("waf_rules.conf", 5),
@@ -43,72 +95,227 @@ PASS_WIRES = "-"
 PASS_KEYPAD = "124578"
 PASS_FIREWALL = "upgrade"
 
-# Server-side puzzle store (token -> {"expected":..., "system":...})
-PUZZLES = {}
+# Server-side puzzle store (token -> {"expected":..., "system":...}), shared like STATE.
+# Abandoned tokens expire after PUZZLE_TTL_SECONDS; at most PUZZLE_MAX_TOKENS are kept.
+# One store for all rooms; each room only sees its own tokens.
+PUZZLE_TTL_SECONDS = 15 * 60
+PUZZLE_MAX_TOKENS = 10000
+ALL_PUZZLES = make_puzzle_store(BASE_STORE, ttl=PUZZLE_TTL_SECONDS, max_size=PUZZLE_MAX_TOKENS)
+
+# Sessions are kept server-side (the cookie is just an id), stored like the puzzles.
+# SESSION_BACKEND=cookie goes back to Flask's signed-cookie sessions.
+SESSION_TTL_SECONDS = 24 * 60 * 60
+SESSION_MAX = 100000
+app.session_interface = make_session_interface(
+    BASE_STORE, os.environ.get("SESSION_BACKEND", "server"), ttl=SESSION_TTL_SECONDS, max_size=SESSION_MAX,
+)
+
+# ======= ROOMS =======
+# Every room is its own game (STATE, defense logs, puzzles, live feed, lock).
+# Join one with ?room=<id> on any page or API call; it sticks in the session.
+# Each client may open a few new rooms, then one a minute (the "room" limit).
+ROOM_IDLE_SECONDS = 30 * 60
+MAX_ROOMS = 10000
+
+def make_room(room_id):
+    if room_id == DEFAULT_ROOM:
+        # the main game keeps the un-prefixed keys, so existing data still loads
+        state, prefix = BASE_STORE, ""
+    else:
+        state, prefix = BASE_STORE.namespace(room_id), f"{room_id}/"
+    if EVENTS:
+        state.load(EVENTS.state(prefix))
+        state.listener = lambda key, value: EVENTS.append(event_cause(), prefix + key, value)
+    state.seed(DEFAULT_STATE)
+    # Live updates for the System / Login pages (Server-Sent Events)
+    live = LiveFeed(state.snapshot, coalesce=0.25, poll=1.0)
+    return Room(room_id, state, RoomPuzzles(ALL_PUZZLES, room_id), live)
+
+ROOMS = RoomRegistry(make_room, idle_ttl=ROOM_IDLE_SECONDS, max_rooms=MAX_ROOMS)
+
+def open_room(room_id):
+    """
+    The room, opened if needed. Opening a new one counts against the client's
+    "room" limit and fails while MAX_ROOMS busy rooms are open.
+    Returns (room, None) or (None, refusal response).
+    """
+    room = ROOMS.get(room_id, create=False)
+    if room is not None or room_id == DEFAULT_ROOM:
+        return room or ROOMS.get(room_id), None
+    if RATE_LIMIT:
+        wait = LIMITER.hit("room", client_id())
+        if wait:
+            RATE_LIMITED_TOTAL.inc("room")
+            return None, refusal("Too many new rooms", 429, wait)
+    try:
+        return ROOMS.get(room_id), None
+    except RoomsFull:
+        return None, refusal("All rooms are busy", 503, ROOM_IDLE_SECONDS)
+
+def current_room():
+    if "room" not in g:
+        room_id = request.args.get("room")
+        if valid_room_id(room_id):
+            room, refused = open_room(room_id)
+            if refused is not None:
+                abort(refused)
+            session["room"] = room_id
+        else:
+            room, refused = open_room(session.get("room") or DEFAULT_ROOM)
+            if refused is not None:
+                # the room this session was in is gone and can't be reopened now
+                session.pop("room", None)
+                room = ROOMS.get(DEFAULT_ROOM)
+        g.room = room
+    return g.room
+
+# The rest of the app talks to STATE / PUZZLES / LIVE; they resolve to the current room.
+STATE = LocalProxy(lambda: current_room().state)
+PUZZLES = LocalProxy(lambda: current_room().puzzles)
+LIVE = LocalProxy(lambda: current_room().live)
+
+# ======= METRICS =======
+# Scraped at /metrics. With several gunicorn workers set METRICS_DIR to a shared
+# directory so any worker can report for all of them.
+REQUEST_SECONDS = Histogram(
+    "hackersweb_request_duration_seconds", "Request latency by endpoint and action.",
+    ("method", "endpoint", "action"),
+)
+RESPONSES = Counter("hackersweb_responses_total", "Responses by endpoint and status code.", ("endpoint", "code"))
+RENDER_SECONDS = Histogram("hackersweb_render_seconds", "Time spent rendering each template.", ("template",))
+SOLVE_SECONDS = Histogram(
+    "hackersweb_puzzle_solve_seconds", "Time from starting a hack to submitting it.",
+    ("system", "outcome"), buckets=(1, 2, 5, 10, 20, 30, 60, 120, 300, 900),
+)
+HACKS = Counter("hackersweb_hacks_total", "Submitted hacks by system and outcome.", ("system", "outcome"))
+COOLDOWN_REJECTIONS = Counter("hackersweb_cooldown_rejections_total", "Hack starts refused by the cooldown.")
+RATE_LIMITED_TOTAL = Counter("hackersweb_rate_limited_total", "Requests refused by a rate limit.", ("policy",))
+
+GAUGE_HELP = {
+    "hackersweb_puzzle_store": "Puzzle token store stats (size, evictions, expirations, approx_bytes).",
+    "hackersweb_session_store": "Server-side session store stats.",
+    "hackersweb_rate_limit_keys": "Clients tracked per rate-limit policy.",
+    "hackersweb_players": "Players on the leaderboard.",
+    "hackersweb_players_dropped": "Lowest-ranked accounts dropped to stay under LEADERBOARD_MAX_PLAYERS.",
+    "hackersweb_page_cache": "Rendered-page cache (size, hits, misses).",
+    "hackersweb_rooms": "Rooms held in memory.",
+    "hackersweb_room_evictions": "Idle rooms evicted so far.",
+    "hackersweb_game_state": "Counters of the main room.",
+    "hackersweb_event_log_pending": "Events queued for the next group commit.",
+}
+GAUGE_LABELS = {"hackersweb_puzzle_store": ("stat",), "hackersweb_session_store": ("stat",),
+                "hackersweb_rate_limit_keys": ("policy",),
+                "hackersweb_page_cache": ("stat",), "hackersweb_game_state": ("key",)}
+
+def metric_gauges():
+    gauges = {}
+    for stat, value in ALL_PUZZLES.stats().items():
+        gauges[("hackersweb_puzzle_store", (stat,))] = value
+    sessions = getattr(app.session_interface, "store", None)
+    if sessions is not None:
+        for stat, value in sessions.stats().items():
+            gauges[("hackersweb_session_store", (stat,))] = value
+    for policy, keys in LIMITER.backend.stats().items():
+        gauges[("hackersweb_rate_limit_keys", (policy,))] = keys
+    gauges[("hackersweb_players", ())] = len(LEADERBOARD)
+    gauges[("hackersweb_players_dropped", ())] = LEADERBOARD.dropped
+    gauges[("hackersweb_page_cache", ("size",))] = len(PAGES)
+    gauges[("hackersweb_page_cache", ("hits",))] = PAGES.hits
+    gauges[("hackersweb_page_cache", ("misses",))] = PAGES.misses
+    gauges[("hackersweb_rooms", ())] = len(ROOMS)
+    gauges[("hackersweb_room_evictions", ())] = ROOMS.evictions
+    for key, value in ROOMS.get(DEFAULT_ROOM).state.snapshot().items():
+        gauges[("hackersweb_game_state", (key,))] = value
+    if EVENTS:
+        gauges[("hackersweb_event_log_pending", ())] = len(EVENTS._pending)
+    return gauges
+
+METRICS_DIR = os.environ.get("METRICS_DIR")
+METRICS_DUMP = WorkerDump(METRICS_DIR, metric_gauges) if METRICS_DIR else None
+
+def known_action():
+    """The action of this request, if it is one we know (keeps label values bounded)."""
+    action = (request.view_args or {}).get("action") or request.form.get("action") or ""
+    return action if action in HACK_ACTIONS or action in DEFENDER_ACTIONS else ""
+
+# ======= RATE LIMITS =======
+# Enforced server-side per client (IP address), so dropping the cookie doesn't help.
+# Behind a proxy/router set TRUSTED_PROXIES to the number of hops in front of the app;
+# on Render (which sets RENDER) that is its one load balancer.
+TRUSTED_PROXIES = int(os.environ.get("TRUSTED_PROXIES", "1" if os.environ.get("RENDER") else "0"))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
+# Cooldown after finish/cancel (seconds); load tests set COOLDOWN_SECONDS=0
+COOLDOWN_SECONDS = int(os.environ.get("COOLDOWN_SECONDS", "10"))
+# RATE_LIMIT=off switches the per-route limits off (load tests); the cooldown stays
+RATE_LIMIT = os.environ.get("RATE_LIMIT", "on") != "off"
+
+RATE_POLICIES = {
+    "hack": TokenBucket(rate=5, burst=20),           # /hack actions
+    "market": TokenBucket(rate=2, burst=10),         # black market sales
+    "password": SlidingWindow(limit=10, window=60),  # defender password checks
+    "room": TokenBucket(rate=1 / 60, burst=10),      # opening rooms that aren't open yet
+}
+# Players behind one address (NAT) that may hack without cooling each other down.
+# The cooldown is always keyed by address, so dropping the cookie doesn't skip it;
+# above 1 every player also gets their own one-hack bucket on top of it.
+COOLDOWN_PER_ADDRESS = max(1, int(os.environ.get("COOLDOWN_PER_ADDRESS", "1")))
+if COOLDOWN_SECONDS > 0:
+    # COOLDOWN_PER_ADDRESS hacks per COOLDOWN_SECONDS per address
+    RATE_POLICIES["cooldown"] = TokenBucket(rate=COOLDOWN_PER_ADDRESS / COOLDOWN_SECONDS, burst=COOLDOWN_PER_ADDRESS)
+    if COOLDOWN_PER_ADDRESS > 1:
+        RATE_POLICIES["cooldown_player"] = TokenBucket(rate=1 / COOLDOWN_SECONDS, burst=1)
+LIMITER = make_limiter(BASE_STORE, RATE_POLICIES)
+
+# POST endpoint -> policy; the password policy only counts the "choose" action
+RATE_LIMITED = {
+    "hack": "hack", "api.api_hack": "hack",
+    "black_market": "market", "api.api_sell": "market",
+    "login": "password", "api.api_defender": "password",
+}
+
+def client_id():
+    return request.remote_addr or "-"
+
+def cooldown_key():
+    return f"{current_room().id}:{client_id()}"
 
-# Cooldown after finish/cancel (seconds)
-COOLDOWN_SECONDS = 10
+def player_cooldown_key():
+    return f"{current_room().id}:{player_id()}"
 
 def start_cooldown():
-    session["hack_cooldown_until"] = time.time() + COOLDOWN_SECONDS
+    if COOLDOWN_SECONDS > 0:
+        LIMITER.hit("cooldown", cooldown_key())
+        if COOLDOWN_PER_ADDRESS > 1:
+            LIMITER.hit("cooldown_player", player_cooldown_key())
 
 def cooldown_remaining():
-    until = session.get("hack_cooldown_until", 0)
-    return max(0, int(round(until - time.time())))
+    if COOLDOWN_SECONDS <= 0:
+        return 0
+    wait = LIMITER.wait("cooldown", cooldown_key())
+    if COOLDOWN_PER_ADDRESS > 1 and "player" in session:
+        wait = max(wait, LIMITER.wait("cooldown_player", player_cooldown_key()))
+    return math.ceil(wait)
 
 
 # ======= HELPERS (PUZZLES MATCH TRAINING RULES) =======
-def gen_wires():
-    case = random.choice(["two_rb", "two_gy", "three_any", "one_red_other"])
-    if case == "two_rb":
-        return {"system": "wires", "desc": "Indicators: 2 lights | wires: red, blue", "expected": "connect red blue"}
-    elif case == "two_gy":
-        return {"system": "wires", "desc": "Indicators: 2 lights | wires: green, yellow", "expected": "cut green"}
-    elif case == "three_any":
-        # show two random wires for flavor but expected remains 'disconnect all'
-        colors = ["red", "green", "blue", "yellow"]
-        shown = random.sample(colors, 2)
-        desc = f"Indicators: 3 lights | wires: {shown[0]}, {shown[1]}"
-        return {"system": "wires", "desc": desc, "expected": "disconnect all"}
-    else:
-        other = random.choice(["blue", "green", "yellow"])
-        return {"system": "wires", "desc": f"Indicators: 1 light | wires: red, {other}", "expected": f"cut {other}"}
-
-def gen_keypad():
-    n = random.randint(1, 9)
-    if n == 9:
-        expected = "999"
-    elif n % 2 == 0:
-        expected = str(n * 2)
-    else:
-        expected = str(n + 3)
-    return {"system": "keypad", "desc": f"Indicator number: {n}", "expected": expected}
-
-def gen_firewall():
-    start = random.choice("ABCD")
-    rest = "".join(random.choice("ABCDEF") for _ in range(2))
-    pat = (start + rest).upper()
-    if start == "A":
-        expected = pat[::-1]
-    elif start == "B":
-        expected = pat + pat
-    elif start == "C":
-        mid = len(pat) // 2
-        expected = pat[:mid] + pat[mid+1:]
-    else:
-        expected = pat
-    return {"system": "firewall", "desc": f"Firewall pattern: {pat}", "expected": expected}
+# Rules and generators live in puzzles.py; puzzles are served from a pre-generated bank.
+# PUZZLE_WEIGHTS example: "wires=2,keypad=1,firewall=1"
+PUZZLE_WEIGHTS = parse_weights(os.environ.get("PUZZLE_WEIGHTS"))
+PUZZLE_BANK_DEPTH = int(os.environ.get("PUZZLE_BANK_DEPTH", "256"))
+PUZZLE_BANK = PuzzleBank(weights=PUZZLE_WEIGHTS, depth=PUZZLE_BANK_DEPTH)
 
 def start_puzzle():
     """Start a random puzzle; store expected server-side and token in session only."""
-    p = random.choice([gen_wires(), gen_keypad(), gen_firewall()])
+    p = PUZZLE_BANK.draw()
     # display fields (safe) in session
     session["p_system"] = p["system"]
     session["p_desc"] = p["desc"]
     # server-side expected via token
     token = secrets.token_urlsafe(16)
     session["p_token"] = token
-    PUZZLES[token] = {"expected": p["expected"], "system": p["system"]}
+    PUZZLES[token] = {"expected": p["expected"], "system": p["system"], "started": time.time()}
 
 def clear_puzzle():
     """Remove server-side token and any session puzzle keys."""
@@ -118,6 +325,22 @@ def clear_puzzle():
     session.pop("p_system", None)
     session.pop("p_desc", None)
 
+def defense_logs(snap):
+    """Rebuild the old DEFENSE_LOGS shape from a state snapshot (for templates)."""
+    return {
+        d: {"success": snap.get(f"log:{d}:success", 0), "fail": snap.get(f"log:{d}:fail", 0)}
+        for d in DEFENSES
+    }
+
+def traced_penalty():
+    """Take up to TRACED_PENALTY_GB off the hackers. Returns how much was actually taken."""
+    old, new = STATE.incr("files", -TRACED_PENALTY_GB, lo=0)
+    return old - new
+
+def count_down_boost():
+    if STATE["defense_boost_hacks_left"] > 0:
+        STATE.incr("defense_boost_hacks_left", -1, lo=0)
+
 def hacker_success(system):
     selection = random.sample(FILE_POOL, k=2)
     size = sum(sz for _, sz in selection)
@@ -129,14 +352,373 @@ def hacker_success(system):
         reduced = max(1, int(round(size * DEFENSE_REDUCTION_MULTIPLIER)))
         size = reduced
 
-    STATE["files"] += size
+    STATE.incr("files", size)
     return selection, size
 
 
+# ======= LEADERBOARD =======
+# One ranking of players across all rooms. A player is whoever holds the session.
+# With a shared STATE_BACKEND the accounts live there and each worker syncs its
+# index every LEADERBOARD_REFRESH_SECONDS.
+LEADERBOARD_SIZE = 10
+LEADERBOARD_REFRESH_SECONDS = float(os.environ.get("LEADERBOARD_REFRESH_SECONDS", "2"))
+# past this many accounts the lowest-ranked ones are dropped (like sessions, bounded)
+LEADERBOARD_MAX_PLAYERS = int(os.environ.get("LEADERBOARD_MAX_PLAYERS", str(SESSION_MAX)))
+LEADERBOARD = make_leaderboard(
+    BASE_STORE, k=LEADERBOARD_SIZE, refresh=LEADERBOARD_REFRESH_SECONDS, max_players=LEADERBOARD_MAX_PLAYERS,
+)
+# kind -> (LEADERBOARD.version, rendered top-K); rebuilt only when the top K changes
+BOARD_CACHE = {}
+HANDLE_MAX = 20
+
+def player_id():
+    pid = session.get("player")
+    if pid is None:
+        pid = session["player"] = secrets.token_hex(6)
+    return pid
+
+def player_name():
+    return session.get("handle") or f"hacker-{player_id()[:4]}"
+
+def cached_board(kind, build):
+    LEADERBOARD.sync()
+    version = LEADERBOARD.version
+    hit = BOARD_CACHE.get(kind)
+    if hit is None or hit[0] != version:
+        hit = BOARD_CACHE[kind] = (version, build(LEADERBOARD.top()))
+    return hit[1]
+
+
+# ======= GAME ACTIONS =======
+# Every state change lives here once. The HTML views and /api/v1 both call
+# these, so the two can never disagree about the rules. Each returns a result
+# dict: {"ok"/"neutral", "msg", "bad"} like the templates expect, or
+# {"warn": ...} for "you can't do that right now" (the pages flash those).
+
+def active_puzzle():
+    """Puzzle visible only if token exists server-side."""
+    token = session.get("p_token")
+    if token and token in PUZZLES:
+        return {"system": session.get("p_system"), "desc": session.get("p_desc")}
+    return None
+
+def hack_new(form):
+    # If already active, warn
+    if session.get("p_token") and session["p_token"] in PUZZLES:
+        return {"warn": "A hack is already in progress."}
+    # Enforce 10s cooldown
+    rem = cooldown_remaining()
+    if rem > 0:
+        COOLDOWN_REJECTIONS.inc()
+        return {"neutral": True, "msg": f"Cooldown active — try again in {rem}s.", "cooldown": rem}
+    start_puzzle()
+    return {"ok": True, "msg": "Hack started."}
+
+def hack_submit(form):
+    token = session.get("p_token")
+    # one lookup: the token can expire between a "contains" check and a read
+    current = PUZZLES.get(token) if token else None
+    if not current:
+        return {"warn": "Start a hack first."}
+
+    # JSON clients may send numbers (keypad answers are digits)
+    answer = str(form.get("answer", "")).strip().lower()
+    expected = (current.get("expected") or "").strip().lower()
+    sysname = current.get("system")
+
+    if answer == "":
+        return {"neutral": True, "msg": "You must enter an answer to submit."}
+
+    outcome = "success" if expected != "" and answer == expected else "fail"
+    HACKS.inc(sysname, outcome)
+    if current.get("started"):
+        SOLVE_SECONDS.observe(time.time() - current["started"], sysname, outcome)
+
+    if outcome == "success":
+        files, total = hacker_success(sysname)
+        LEADERBOARD.record(player_id(), player_name(), intel=total, system=sysname, success=True)
+        STATE.incr(f"log:{sysname}:success")
+        result = {
+            "ok": True,
+            "msg": f"Hack success on {sysname.upper()} — +{total}GB intel.",
+            "files": files,
+            "total": total,
+        }
+    else:
+        LEADERBOARD.record(player_id(), player_name(), system=sysname, success=False)
+        STATE.incr(f"log:{sysname}:fail")
+        max_detection = STATE["max_detection"]
+        _, detection = STATE.incr("detection", 1, hi=max_detection)
+
+        # At max detection, apply -12GB penalty
+        if detection >= max_detection:
+            penalty = traced_penalty()
+            result = {
+                "ok": False,
+                "msg": f"Hack failed on {sysname.upper()} — detection raised. ",
+                "bad": f"Been traced — -{penalty}GB penalty."
+            }
+        else:
+            result = {"ok": False, "msg": f"Hack failed on {sysname.upper()} — detection raised."}
+
+    # count down defense boost attempts if active
+    count_down_boost()
+
+    # start cooldown and cleanup
+    start_cooldown()
+    clear_puzzle()
+    return result
+
+def hack_cancel(form):
+    token = session.get("p_token")
+    if not token or token not in PUZZLES:
+        return {"warn": "No active hack to cancel."}
+
+    # If at max detection, traced penalty instead of +1 detection
+    max_detection = STATE["max_detection"]
+    old, _ = STATE.incr("detection", 1, hi=max_detection)
+    if old >= max_detection:
+        penalty = traced_penalty()
+        # you chose ok=True for this case
+        result = {"ok": True, "msg": "Hack cancelled. ", "bad": f"Been traced — -{penalty}GB penalty."}
+    else:
+        result = {"ok": True, "msg": "Hack cancelled. ", "bad": "Detection +1."}
+
+    count_down_boost()
+
+    # start cooldown and cleanup
+    start_cooldown()
+    clear_puzzle()
+    return result
+
+def hack_reroll(form):
+    token = session.get("p_token")
+    if not token or token not in PUZZLES:
+        return {"warn": "Start a hack first."}
+    if not STATE.spend("credits", REROLL_COST):
+        return {"neutral": True, "msg": f"Not enough credits for Reroll (cost {REROLL_COST})."}
+    # regenerate puzzle (replace existing token)
+    clear_puzzle()
+    start_puzzle()
+    return {"ok": True, "msg": "Puzzle rerolled."}
+
+def hack_cooldown(form):
+    if not STATE.spend("credits", COOLDOWN_COST):
+        return {"neutral": True, "msg": f"Not enough credits for Cool Down (cost {COOLDOWN_COST})."}
+    STATE.incr("detection", -1, lo=0)
+    return {"ok": True, "msg": "System cooled. Detection decreased by 1."}
+
+HACK_ACTIONS = {
+    "new": hack_new,
+    "submit": hack_submit,
+    "cancel": hack_cancel,
+    "reroll": hack_reroll,
+    "cooldown": hack_cooldown,
+}
+
+def defender_choose(form):
+    defense = str(form.get("defense", ""))
+    pwd = str(form.get("def_pass", ""))
+    ok = False
+    if defense == "wires" and pwd == PASS_WIRES:
+        ok = True
+    elif defense == "keypad" and pwd == PASS_KEYPAD:
+        ok = True
+    elif defense == "firewall" and pwd == PASS_FIREWALL:
+        ok = True
+
+    if not ok:
+        return {"ok": False, "msg": "Invalid defense or password."}
+    # new privileges, new session id: an id planted before the login is worthless
+    regenerate(session)
+    session["admin_scope"] = defense
+    return {"ok": True, "msg": f"Managing {defense}."}
+
+def defender_logs(form):
+    scope = session["admin_scope"]
+    stats = {"success": STATE.get(f"log:{scope}:success"), "fail": STATE.get(f"log:{scope}:fail")}
+    return {"ok": True, "msg": "", "stats": stats}
+
+def defender_download(form):
+    if not STATE.compare_and_set("defense_boost_available", 1, 0):
+        return {"ok": False, "msg": "Increase Defense already used this detection."}
+    STATE.set("defense_boost_hacks_left", BOOST_HACKS)
+    return {"ok": True, "msg": f"Defense increased: next {BOOST_HACKS} hacks yield reduced intel."}
+
+def defender_logout(form):
+    session.pop("admin_scope", None)
+    return {"ok": True, "msg": "Logged out."}
+
+def defender_cancel_detection(form):
+    # detection never goes above max, so "full" means exactly max
+    if not STATE.compare_and_set("detection", STATE["max_detection"], 0):
+        return {"ok": False, "msg": "Detection is not full. Nothing to cancel."}
+    STATE.incr("files", -CANCEL_DETECTION_PENALTY_GB, lo=0)
+    # recharge the one use for the NEW detection cycle
+    STATE.set("defense_boost_available", 1)
+    return {"ok": True, "msg": f"Detection cancelled. −{CANCEL_DETECTION_PENALTY_GB}GB penalty applied to hackers."}
+
+# name -> (handler, needs a defense login first)
+DEFENDER_ACTIONS = {
+    "choose": (defender_choose, False),
+    "logs": (defender_logs, True),
+    "download": (defender_download, True),
+    "logout": (defender_logout, False),
+    "cancel_detection": (defender_cancel_detection, True),
+}
+
+def run_defender_action(action, form):
+    """Returns a result dict, or None for an unknown action."""
+    entry = DEFENDER_ACTIONS.get(action)
+    if entry is None:
+        return None
+    handler, needs_scope = entry
+    if needs_scope and not session.get("admin_scope"):
+        return {"ok": False, "msg": "Log in to a defense first.", "forbidden": True}
+    return handler(form)
+
+def sell_intel(form):
+    """
+    Sell stolen intel for credits.
+    Ratio: 3 GB -> 1 credit (full groups only).
+    """
+    gb = form.get("gb", "0")
+    # whole numbers only: a JSON 3.9 or true is not an amount (and neither is "3.9")
+    if isinstance(gb, str):
+        qty = int(gb) if gb.strip().isdigit() else 0
+    elif isinstance(gb, int) and not isinstance(gb, bool):
+        qty = gb
+    else:
+        qty = 0
+
+    if qty <= 0:
+        return {"neutral": True, "ok": False, "text": "Enter a valid amount.", "sold": 0, "gained": 0}
+    if qty > STATE["files"]:
+        return {"neutral": True, "ok": False, "text": "Not enough intel to sell.", "sold": 0, "gained": 0}
+    credits = qty // GB_PER_CREDIT
+    if credits <= 0:
+        return {"neutral": True, "ok": False, "text": f"You need at least {GB_PER_CREDIT} GB to get 1 credit.", "sold": 0, "gained": 0}
+    sold = credits * GB_PER_CREDIT
+    if not STATE.spend("files", sold):
+        # someone else spent the intel between the check and the sale
+        return {"neutral": True, "ok": False, "text": "Not enough intel to sell.", "sold": 0, "gained": 0}
+    STATE.incr("credits", credits)
+    LEADERBOARD.record(player_id(), player_name(), credits=credits)
+    return {"neutral": False, "ok": True, "text": f"Sold {sold} GB → +{credits} credits.", "sold": sold, "gained": credits}
+
+def in_room(action, *args):
+    """Run one game action under the current room's lock, so its steps apply as a unit."""
+    with current_room().lock:
+        return action(*args)
+
+def public_state(snap=None):
+    """The game counters a client may see (no internal keys)."""
+    snap = snap or STATE.snapshot()
+    return {k: snap.get(k, 0) for k in DEFAULT_STATE if not k.startswith("log:")}
+
+
+# ======= PAGE CACHE =======
+# Pages that only show the room's counters are rendered once per state version
+# and kept pre-gzipped with strong ETags (see pagecache.py).
+PAGES = PageCache(max_entries=2048)
+STATIC_VERSIONS = {}
+
+def cached_page(template, context=dict, versioned=True):
+    if "_flashes" in session:
+        # flashed messages belong to this session: render as usual
+        return render_template(template, **context())
+    room = current_room()
+    # read the version before rendering, so a page is never older than its key
+    key = (template, room.id, room.state.version() if versioned else None)
+    return respond(PAGES.get(key, lambda: render_template(template, **context())), request)
+
+@app.url_defaults
+def static_version(endpoint, values):
+    if endpoint != "static" or "filename" not in values:
+        return
+    name = values["filename"]
+    version = STATIC_VERSIONS.get(name)
+    if version is None:
+        with open(os.path.join(app.static_folder, name), "rb") as f:
+            version = STATIC_VERSIONS[name] = hashlib.blake2b(f.read(), digest_size=6).hexdigest()
+    values["v"] = version
+
+
 # ======= ROUTES =======
+@app.context_processor
+def inject_room():
+    return {"room_id": current_room().id}
+
+@app.before_request
+def start_timer():
+    g.t0 = time.perf_counter()
+
+@app.before_request
+def enforce_rate_limit():
+    if not RATE_LIMIT or request.method != "POST":
+        return None
+    policy = RATE_LIMITED.get(request.endpoint)
+    if policy is None:
+        return None
+    if policy == "password" and ((request.view_args or {}).get("action") or request.form.get("action")) != "choose":
+        return None
+    # keyed by policy + client: the page and the API route share one budget
+    wait = LIMITER.hit(policy, client_id())
+    if not wait:
+        return None
+    RATE_LIMITED_TOTAL.inc(policy)
+    return refusal("Too many requests", 429, wait)
+
+def refusal(reason, status, wait):
+    """429/503 with Retry-After: JSON for the API, plain text for the pages."""
+    retry = math.ceil(wait)
+    msg = f"{reason} — try again in {retry}s."
+    if request.blueprint == "api":
+        response = jsonify({"result": {"warn": msg, "retry_after": retry}})
+    else:
+        response = Response(msg, mimetype="text/plain")
+    response.status_code = status
+    response.headers["Retry-After"] = str(retry)
+    return response
+
+@app.after_request
+def push_live_update(response):
+    # every state change is a POST; the feed diffs, so a no-op POST costs nothing
+    if request.method == "POST":
+        LIVE.notify()
+    return response
+
+@app.after_request
+def record_request(response):
+    endpoint = request.endpoint or "unknown"
+    if "t0" in g:
+        REQUEST_SECONDS.observe(time.perf_counter() - g.t0, request.method, endpoint, known_action())
+    RESPONSES.inc(endpoint, str(response.status_code))
+    if METRICS_DUMP:
+        METRICS_DUMP.ensure_running()
+    return response
+
+@before_render_template.connect_via(app)
+def _render_started(sender, template, context, **extra):
+    g.render_t0 = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def _render_finished(sender, template, context, **extra):
+    if "render_t0" in g:
+        RENDER_SECONDS.observe(time.perf_counter() - g.render_t0, template.name)
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition."""
+    local, gauges = collect_local(), metric_gauges()
+    if METRICS_DUMP:
+        local, gauges = METRICS_DUMP.collect_all(local, gauges)
+    text = render_metrics(local, gauges, GAUGE_HELP, GAUGE_LABELS)
+    return Response(text, mimetype="text/plain; version=0.0.4")
+
 @app.route("/")
 def index():
-    return render_template("index.html", state=STATE)
+    return cached_page("index.html", lambda: {"state": STATE.snapshot()})
 
 @app.route("/training")
 def training():
@@ -145,7 +727,8 @@ def training():
     if token and token in PUZZLES:
         flash("Finish or cancel your current hack first.", "warn")
         return redirect(url_for("hack"))
-    return render_template("training.html")
+    # the rules never change: one copy per room (for the topbar)
+    return cached_page("training.html", versioned=False)
 
 @app.route("/hack", methods=["GET", "POST"])
 def hack():
@@ -156,8 +739,6 @@ def hack():
     After submit or cancel, a 10s cooldown starts.
     """
     result = None
-    files = []
-    total = 0
 
     # Cleanup: if a token is in session but not present server-side, clear it.
     token = session.get("p_token")
@@ -165,184 +746,54 @@ def hack():
         clear_puzzle()
 
     if request.method == "POST":
-        action = request.form.get("action")
-
-        if action == "new":
-            # If already active, warn
-            if session.get("p_token") and session["p_token"] in PUZZLES:
-                flash("A hack is already in progress.", "warn")
-            else:
-                # Enforce 10s cooldown
-                rem = cooldown_remaining()
-                if rem > 0:
-                    result = {"neutral": True, "msg": f"Cooldown active — try again in {rem}s."}
-                else:
-                    start_puzzle()
-
-        elif action == "submit":
-            token = session.get("p_token")
-            if not token or token not in PUZZLES:
-                flash("Start a hack first.", "warn")
-            else:
-                answer = (request.form.get("answer") or "").strip().lower()
-                expected = (PUZZLES.get(token, {}).get("expected") or "").strip().lower()
-                sysname = PUZZLES.get(token, {}).get("system")
-
-                if answer == "":
-                    result = {"neutral": True, "msg": "You must enter an answer to submit."}
-                else:
-                    if expected != "" and answer == expected:
-                        files, total = hacker_success(sysname)
-                        DEFENSE_LOGS[sysname]["success"] += 1
-                        result = {"ok": True, "msg": f"Hack success on {sysname.upper()} — +{total}GB intel."}
-                    else:
-                        DEFENSE_LOGS[sysname]["fail"] += 1
-                        STATE["detection"] = min(STATE["max_detection"], STATE["detection"] + 1)
-
-                        # At max detection, apply -12GB penalty
-                        if STATE["detection"] >= STATE["max_detection"]:
-                            penalty = min(12, STATE["files"])
-                            STATE["files"] -= penalty
-                            result = {
-                                "ok": False,
-                                "msg": f"Hack failed on {sysname.upper()} — detection raised. ",
-                                "bad": f"Been traced — -{penalty}GB penalty."
-                            }
-                        else:
-                            result = {"ok": False, "msg": f"Hack failed on {sysname.upper()} — detection raised."}
-
-                    # count down defense boost attempts if active
-                    if STATE["defense_boost_hacks_left"] > 0:
-                        STATE["defense_boost_hacks_left"] -= 1
-
-                    # start cooldown and cleanup
-                    start_cooldown()
-                    clear_puzzle()
-
-        elif action == "cancel":
-            token = session.get("p_token")
-            if not token or token not in PUZZLES:
-                flash("No active hack to cancel.", "warn")
-            else:
-                # If at max detection, traced penalty instead of +1 detection
-                if STATE["detection"] >= STATE["max_detection"]:
-                    penalty = min(12, STATE["files"])
-                    STATE["files"] -= penalty
-                    # you chose ok=True for this case
-                    result = {"ok": True, "msg": "Hack cancelled. ", "bad": f"Been traced — -{penalty}GB penalty."}
-                else:
-                    STATE["detection"] = min(STATE["max_detection"], STATE["detection"] + 1)
-                    result = {"ok": True, "msg": "Hack cancelled. ", "bad": "Detection +1."}
-
-                if STATE["defense_boost_hacks_left"] > 0:
-                    STATE["defense_boost_hacks_left"] -= 1
-
-                # start cooldown and cleanup
-                start_cooldown()
-                clear_puzzle()
-
-        elif action == "reroll":
-            token = session.get("p_token")
-            if not token or token not in PUZZLES:
-                flash("Start a hack first.", "warn")
-            else:
-                if STATE["credits"] < 1:
-                    result = {"neutral": True, "msg": "Not enough credits for Reroll (cost 1)."}
-                else:
-                    STATE["credits"] -= 1
-                    # regenerate puzzle (replace existing token)
-                    clear_puzzle()
-                    start_puzzle()
-                    result = {"ok": True, "msg": "Puzzle rerolled."}
-
-        elif action == "cooldown":
-            if STATE["credits"] < 5:
-                result = {"neutral": True, "msg": "Not enough credits for Cool Down (cost 5)."}
-            else:
-                STATE["credits"] -= 5
-                STATE["detection"] = max(0, STATE["detection"] - 1)
-                result = {"ok": True, "msg": "System cooled. Detection decreased by 1."}
-
-    # Puzzle visible only if token exists server-side
-    puzzle = None
-    token = session.get("p_token")
-    if token and token in PUZZLES:
-        puzzle = {"system": session.get("p_system"), "desc": session.get("p_desc")}
+        handler = HACK_ACTIONS.get(request.form.get("action"))
+        if handler:
+            result = in_room(handler, request.form)
+            if "warn" in result:
+                flash(result["warn"], "warn")
+                result = None
 
     return render_template(
         "hack.html",
-        state=STATE,
-        puzzle=puzzle,
+        state=STATE.snapshot(),
+        puzzle=active_puzzle(),
         result=result,
-        files=files,
-        total=total,
+        files=(result or {}).get("files", []),
+        total=(result or {}).get("total", 0),
     )
 
 # ---------- LOGIN (DEFENDER MENU WITH PASSWORD PER DEFENSE) ----------
 @app.route("/login", methods=["GET", "POST"])
 def login():
-    admin_scope = session.get("admin_scope")
     result = None
     stats = None
 
     if request.method == "POST":
         action = request.form.get("action")
+        result = in_room(run_defender_action, action, request.form)
 
-        if action == "choose":
-            defense = request.form.get("defense", "")
-            pwd = request.form.get("def_pass", "")
-            ok = False
-            if defense == "wires" and pwd == PASS_WIRES:
-                ok = True
-            elif defense == "keypad" and pwd == PASS_KEYPAD:
-                ok = True
-            elif defense == "firewall" and pwd == PASS_FIREWALL:
-                ok = True
-
-            if ok:
-                session["admin_scope"] = defense
-                return redirect(url_for("login"))
-            else:
-                result = {"ok": False, "msg": "Invalid defense or password."}
-
-        elif action == "logs" and admin_scope:
-            s = DEFENSE_LOGS.get(admin_scope, {"success": 0, "fail": 0})
-            stats = {"success": s["success"], "fail": s["fail"]}
-
-        elif action == "download" and admin_scope:
-            if STATE["defense_boost_available"] <= 0:
-                result = {"ok": False, "msg": "Increase Defense already used this detection."}
-            else:
-                STATE["defense_boost_available"] = 0
-                STATE["defense_boost_hacks_left"] = 8
-                result = {"ok": True, "msg": "Defense increased: next 8 hacks yield reduced intel."}
-
-        elif action == "logout":
-            session.pop("admin_scope", None)
+        if action in ("choose", "logout") and result and result["ok"]:
             return redirect(url_for("login"))
+        if result and "stats" in result:
+            stats = result["stats"]
+            result = None
 
-        elif action == "cancel_detection":
-            if STATE["detection"] >= STATE["max_detection"]:
-                STATE["files"] = max(0, STATE["files"] - 100)
-                STATE["detection"] = 0
-                # recharge the one use for the NEW detection cycle
-                STATE["defense_boost_available"] = 1
-                result = {"ok": True, "msg": "Detection cancelled. −100GB penalty applied to hackers."}
-            else:
-                result = {"ok": False, "msg": "Detection is not full. Nothing to cancel."}
-
+    snap = STATE.snapshot()
     return render_template(
         "login.html",
-        state=STATE,
+        state=snap,
         admin_scope=session.get("admin_scope"),
         stats=stats,
         result=result,
-        can_increase_defense=(STATE["defense_boost_available"] > 0)
+        can_increase_defense=(snap["defense_boost_available"] > 0)
     )
 
 @app.route("/system")
 def system_panel():
-    return render_template("system.html", state=STATE, logs=DEFENSE_LOGS)
+    def context():
+        snap = STATE.snapshot()
+        return {"state": snap, "logs": defense_logs(snap)}
+    return cached_page("system.html", context)
 
 @app.route("/logout")
 def logout():
@@ -352,45 +803,165 @@ def logout():
 # ---------- BLACK MARKET ----------
 @app.route("/black-market", methods=["GET", "POST"])
 def black_market():
-    """
-    Sell stolen intel for credits.
-    Ratio: 3 GB -> 1 credit (full groups only).
-    """
     message = None
-    sold = 0
-    gained = 0
-
     if request.method == "POST":
-        try:
-            qty = int(request.form.get("gb", "0"))
-        except ValueError:
-            qty = 0
-
-        if qty <= 0:
-            message = {"neutral": True, "ok": False, "text": "Enter a valid amount."}
-        elif qty > STATE["files"]:
-            message = {"neutral": True, "ok": False, "text": "Not enough intel to sell."}
-        else:
-            credits = qty // GB_PER_CREDIT
-            if credits <= 0:
-                message = {"neutral": True, "ok": False, "text": f"You need at least {GB_PER_CREDIT} GB to get 1 credit."}
-            else:
-                sold = credits * GB_PER_CREDIT
-                gained = credits
-                STATE["files"] -= sold
-                STATE["credits"] += gained
-                message = {"neutral": False, "ok": True, "text": f"Sold {sold} GB → +{gained} credits."}
+        message = in_room(sell_intel, request.form)
 
     return render_template(
         "black_market.html",
-        state=STATE,
+        state=STATE.snapshot(),
         gb_per_credit=GB_PER_CREDIT,
         price=GB_PER_CREDIT,   # back-compat if old template referenced 'price'
         message=message,
-        sold=sold,
-        gained=gained
+        sold=(message or {}).get("sold", 0),
+        gained=(message or {}).get("gained", 0)
+    )
+
+# ---------- LEADERBOARD ----------
+@app.route("/leaderboard", methods=["GET", "POST"])
+def leaderboard():
+    if request.method == "POST":
+        handle = (request.form.get("handle") or "").strip()[:HANDLE_MAX]
+        if handle:
+            session["handle"] = handle
+            LEADERBOARD.rename(player_id(), handle)
+        return redirect(url_for("leaderboard"))
+
+    table = cached_board("html", lambda rows: Markup(render_template("leaderboard_table.html", rows=rows)))
+    rank, me = LEADERBOARD.player(player_id())
+    return render_template(
+        "leaderboard.html", table=table, rank=rank, me=me, handle=player_name(), players=len(LEADERBOARD),
     )
 
 
+# ---------- JSON API (/api/v1) ----------
+# Same actions as the pages, answered with compact JSON instead of a full page.
+# Bodies can be JSON or form-encoded.
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+def api_form():
+    body = request.get_json(silent=True)
+    return body if isinstance(body, dict) else request.form
+
+@api.before_request
+def require_json_object():
+    body = request.get_json(silent=True)
+    if body is not None and not isinstance(body, dict):
+        return jsonify({"error": "Request body must be a JSON object."}), 400
+
+def api_reply(result, status=200):
+    snap = STATE.snapshot()
+    return jsonify({"result": result, "state": public_state(snap), "puzzle": active_puzzle()}), status
+
+@api.get("/leaderboard")
+def api_leaderboard():
+    top = cached_board("json", lambda rows: json.dumps(rows, separators=(",", ":")))
+    rank, me = LEADERBOARD.player(player_id())
+    you = json.dumps({"rank": rank, "name": player_name(), "stats": me}, separators=(",", ":"))
+    # the top K is encoded once per change; only "you" is encoded per request
+    body = f'{{"players":{len(LEADERBOARD)},"top":{top},"you":{you}}}'
+    return Response(body, mimetype="application/json")
+
+@api.get("/state")
+def api_state():
+    snap = STATE.snapshot()
+    return jsonify({
+        "room": current_room().id,
+        "state": public_state(snap),
+        "logs": defense_logs(snap),
+        "puzzle": active_puzzle(),
+        "cooldown": cooldown_remaining(),
+        "admin_scope": session.get("admin_scope"),
+    })
+
+@api.get("/stream")
+def api_stream():
+    """Server-Sent Events: a full snapshot first, then only the keys that changed."""
+    return Response(
+        LIVE.stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api.post("/hack/<action>")
+def api_hack(action):
+    handler = HACK_ACTIONS.get(action)
+    if handler is None:
+        return jsonify({"error": f"Unknown hack action: {action}"}), 404
+    token = session.get("p_token")
+    if token and token not in PUZZLES:
+        clear_puzzle()
+    result = in_room(handler, api_form())
+    return api_reply(result, 409 if "warn" in result else 200)
+
+@api.post("/market/sell")
+def api_sell():
+    return api_reply(in_room(sell_intel, api_form()))
+
+@api.post("/defender/<action>")
+def api_defender(action):
+    result = in_room(run_defender_action, action, api_form())
+    if result is None:
+        return jsonify({"error": f"Unknown defender action: {action}"}), 404
+    return api_reply(result, 403 if result.get("forbidden") else 200)
+
+
+# ---------- HEALTH ----------
+# Both skip the session and the rooms, so a health checker costs next to nothing.
+@app.get("/health")
+def health():
+    """Liveness: the process answers."""
+    return Response("OK", mimetype="text/plain")
+
+@app.get("/ready")
+def ready():
+    """Readiness: warmed up and the state backend answers."""
+    if not BOOT:
+        return Response("starting", status=503, mimetype="text/plain")
+    try:
+        BASE_STORE.get("max_detection")
+    except Exception as exc:
+        return Response(f"state backend unavailable: {exc}", status=503, mimetype="text/plain")
+    return Response("ready", mimetype="text/plain")
+
+
+# ======= APP FACTORY =======
+# step -> seconds spent warming it up (empty until create_app() has run)
+BOOT = {}
+
+def create_app(warm=True):
+    """
+    Finish the app and pay every first-request cost up front: compile all
+    templates, fill the puzzle bank, build the main room, hash the static
+    files and build the URL matcher. With gunicorn --preload this runs once
+    in the master and the workers share the result copy-on-write (see
+    gunicorn_conf.py). Safe to call again; `gunicorn "app:create_app()"` works too.
+    """
+    if BOOT:
+        return app
+    t0 = time.perf_counter()
+    if "api" not in app.blueprints:
+        app.register_blueprint(api)
+    steps = {
+        "templates": lambda: [app.jinja_env.get_template(name) for name in app.jinja_env.list_templates()],
+        "puzzles": PUZZLE_BANK.fill,
+        "rooms": lambda: ROOMS.get(DEFAULT_ROOM),
+        "static": lambda: [
+            static_version("static", {"filename": entry.name})
+            for entry in os.scandir(app.static_folder) if entry.is_file()
+        ],
+        "routes": lambda: app.url_map.bind("localhost").match("/"),
+    }
+    for name, step in steps.items() if warm else ():
+        t = time.perf_counter()
+        step()
+        BOOT[name] = time.perf_counter() - t
+    BOOT["total"] = time.perf_counter() - t0
+    return app
+
+# WARM_START=0 skips the warm-up (only useful to measure what it saves)
+create_app(warm=os.environ.get("WARM_START", "1") != "0")
+
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,167 @@
+"""
+How many slow clients can a server mode take before normal players suffer?
+
+Starts gunicorn in the given mode, opens N "slow" connections (a request
+line and one header, then nothing — a stalled upload or idle keep-alive),
+plus a few /api/v1/stream subscribers, then fires normal GET /api/v1/state
+requests and reports how many got through and how fast.
+
+    python bench/bench_concurrency.py --mode sync --slow 0 10 100
+    python bench/bench_concurrency.py --mode gevent --slow 0 100 500 950 1200
+
+--store sqlite runs the game on a SQLite file instead of in memory. With
+--lock-hold another process (standing in for a second worker) keeps taking
+the database write lock for that many seconds at a time, and --writers
+threads keep POSTing /api/v1/hack/new (a session + puzzle write each) while
+the GET /api/v1/state reads are measured.
+
+    python bench/bench_concurrency.py --mode gevent --store sqlite --slow 0 \
+        --requests 100 --writers 4 --lock-hold 0.5
+
+One run here (gevent, 1 worker, 100 reads):
+
+    memory                                 p50 30ms  p95 32ms
+    sqlite                                 p50 21ms  p95 28ms
+    sqlite + 4 writers                     p50 30ms  p95 44ms
+    sqlite + 4 writers + lock held 0.5s    p50 32ms  p95 45ms   (1073ms / 1641ms
+                                           before sqlite3 calls moved to the hub threadpool)
+"""
+import argparse
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+MODES = {
+    "sync": ["gunicorn", "-w", "1", "-k", "sync", "--timeout", "30", "app:app"],
+    "gevent": ["gunicorn", "-c", "gunicorn_conf.py", "serve_async:app"],
+}
+
+
+def start_server(mode, port, extra_env=None):
+    env = dict(os.environ, PORT=str(port), **(extra_env or {}))
+    cmd = MODES[mode] + ["--bind", f"127.0.0.1:{port}", "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env)
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/v1/state", timeout=1).read()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{mode} server did not come up")
+
+
+def open_slow(port, n):
+    socks = []
+    for _ in range(n):
+        s = socket.create_connection(("127.0.0.1", port))
+        s.sendall(b"GET /api/v1/state HTTP/1.1\r\nHost: bench\r\n")
+        socks.append(s)
+    return socks
+
+
+def open_streams(port, n):
+    socks = []
+    for _ in range(n):
+        s = socket.create_connection(("127.0.0.1", port))
+        s.sendall(b"GET /api/v1/stream HTTP/1.1\r\nHost: bench\r\n\r\n")
+        socks.append(s)
+    return socks
+
+
+def one_request(port, timeout):
+    t0 = time.perf_counter()
+    try:
+        urllib.request.urlopen(f"http://127.0.0.1:{port}/api/v1/state", timeout=timeout).read()
+        return time.perf_counter() - t0
+    except OSError:
+        return None
+
+
+def hold_write_lock(path, hold, stop):
+    """Another writer: take the write lock for `hold` seconds, let go briefly, repeat."""
+    db = sqlite3.connect(path, timeout=30, isolation_level=None)
+    while not stop.is_set():
+        db.execute("BEGIN IMMEDIATE")
+        stop.wait(hold)
+        db.execute("COMMIT")
+        time.sleep(0.05)
+    db.close()
+
+
+def keep_writing(port, stop):
+    while not stop.is_set():
+        try:
+            req = urllib.request.Request(
+                f"http://127.0.0.1:{port}/api/v1/hack/new", data=b"{}",
+                headers={"Content-Type": "application/json"},
+            )
+            urllib.request.urlopen(req, timeout=30).read()
+        except OSError:
+            time.sleep(0.05)
+
+
+def run(mode, slow, streams, requests, timeout, port, store="memory", lock_hold=0.0, writers=0):
+    extra_env = {}
+    background = []
+    stop = threading.Event()
+    if store == "sqlite":
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        extra_env = {"STATE_BACKEND": f"sqlite:///{path}", "COOLDOWN_SECONDS": "0", "RATE_LIMIT": "off"}
+    proc = start_server(mode, port, extra_env)
+    try:
+        if store == "sqlite" and lock_hold:
+            background.append(threading.Thread(target=hold_write_lock, args=(path, lock_hold, stop)))
+        background += [threading.Thread(target=keep_writing, args=(port, stop)) for _ in range(writers)]
+        for t in background:
+            t.start()
+        held = open_slow(port, slow) + open_streams(port, streams)
+        time.sleep(0.5)
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            lat = list(pool.map(lambda _: one_request(port, timeout), range(requests)))
+        for s in held:
+            s.close()
+    finally:
+        stop.set()
+        proc.terminate()
+        proc.wait()
+        for t in background:
+            t.join()
+    label = f"{mode:<7} {store:<7} slow={slow:<5}"
+    ok = sorted(x for x in lat if x is not None)
+    if not ok:
+        return f"{label} ok=0/{requests} (all timed out after {timeout}s)"
+    p50 = ok[len(ok) // 2] * 1000
+    p95 = ok[min(len(ok) - 1, int(len(ok) * 0.95))] * 1000
+    return f"{label} ok={len(ok)}/{requests}  p50={p50:.1f}ms  p95={p95:.1f}ms"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mode", choices=sorted(MODES), default="gevent")
+    ap.add_argument("--slow", type=int, nargs="+", default=[0, 10, 100, 500])
+    ap.add_argument("--streams", type=int, default=5)
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--timeout", type=float, default=3.0)
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--store", choices=["memory", "sqlite"], default="memory")
+    ap.add_argument("--lock-hold", type=float, default=0.0, help="sqlite: seconds another writer holds the lock")
+    ap.add_argument("--writers", type=int, default=0, help="threads POSTing /api/v1/hack/new meanwhile")
+    args = ap.parse_args()
+    for n in args.slow:
+        print(run(args.mode, n, args.streams, args.requests, args.timeout, args.port,
+                  args.store, args.lock_hold, args.writers), flush=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Leaderboard at scale: incremental SortedList ranking vs sorting on every view.
+
+Feeds random hack / sale events for --players players into a Leaderboard,
+then compares a leaderboard view (top K + the viewer's rank) against the
+scan-and-sort a ranking would need without the index. Also reports how
+often the top K actually changed (= how often the cached page is rebuilt).
+
+    python bench/bench_leaderboard.py [--players 100000] [--events 1000000]
+    python bench/bench_leaderboard.py --store sqlite:////tmp/lb.db --events 200000
+
+With --store (a shared STATE_BACKEND) it times the shared board instead:
+an event, a refresh of the top K and a viewer's rank at the top, middle
+and bottom of the ranking.
+
+One run here:
+
+    players 99,995, events 1,000,000: 42,479 events/s (23.5 us/event)
+    top-10 changed on 402 events (0.04%): the only times the cached page is rebuilt
+    view (top 10 + own rank): indexed 20.2 us, sort per view 271.8 ms (x13,424)
+
+    --store sqlite:////tmp/lb.db --events 200000 --views 50:
+    players 86,473, events 200,000: 5,810 events/s (172.1 us/event)
+    refresh (top 10 + player count): 7.10 ms
+    viewer at the top (rank 1): 0.06 ms
+    viewer at the middle (rank 43,237): 5.39 ms
+    viewer at the bottom (rank 86,473): 12.79 ms
+
+SQLite has no order-statistic index, so a rank is an index range count:
+cheap near the top, growing with the rank (Redis ZRANK is O(log n)).
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from leaderboard import Leaderboard, make_leaderboard  # noqa: E402
+from state_store import make_store  # noqa: E402
+
+SYSTEMS = ("wires", "keypad", "firewall")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--players", type=int, default=100000)
+    ap.add_argument("--events", type=int, default=1000000)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--views", type=int, default=200)
+    ap.add_argument("--store", help="shared STATE_BACKEND url (sqlite:///..., redis://...)")
+    args = ap.parse_args()
+
+    rng = random.Random(1)
+    board = Leaderboard(k=args.k)
+    ids = [f"p{i:06d}" for i in range(args.players)]
+    events = []
+    for _ in range(args.events):
+        pid = rng.choice(ids)
+        roll = rng.random()
+        if roll < 0.6:
+            events.append((pid, rng.randint(10, 60), 0, rng.choice(SYSTEMS), True))
+        elif roll < 0.9:
+            events.append((pid, 0, 0, rng.choice(SYSTEMS), False))
+        else:
+            events.append((pid, 0, rng.randint(1, 5), None, None))
+
+    if args.store:
+        return shared(args, events, ids)
+
+    t0 = time.perf_counter()
+    for pid, intel, credits, system, success in events:
+        board.record(pid, pid, intel=intel, credits=credits, system=system, success=success)
+    elapsed = time.perf_counter() - t0
+    print(f"players {len(board):,}, events {args.events:,}: {args.events / elapsed:,.0f} events/s "
+          f"({elapsed / args.events * 1e6:.1f} us/event)")
+    print(f"top-{args.k} changed on {board.version:,} events ({board.version / args.events:.2%}): "
+          f"the only times the cached page is rebuilt")
+
+    viewers = [rng.choice(ids) for _ in range(args.views)]
+    t0 = time.perf_counter()
+    for pid in viewers:
+        board.top()
+        board.player(pid)
+    indexed = (time.perf_counter() - t0) / args.views
+
+    players = board._players
+    t0 = time.perf_counter()
+    for pid in viewers:
+        ranking = sorted(players.values(), key=lambda p: p.key())
+        ranking[:args.k]
+        next(i for i, p in enumerate(ranking) if p.id == pid)
+    naive = (time.perf_counter() - t0) / args.views
+
+    print(f"view (top {args.k} + own rank): indexed {indexed * 1e6:,.1f} us, sort per view {naive * 1e3:,.1f} ms "
+          f"(x{naive / indexed:,.0f})")
+
+
+def shared(args, events, ids):
+    board = make_leaderboard(make_store(args.store), k=args.k, refresh=0)
+    t0 = time.perf_counter()
+    for pid, intel, credits, system, success in events:
+        board.record(pid, pid, intel=intel, credits=credits, system=system, success=success)
+    elapsed = time.perf_counter() - t0
+    print(f"{args.store}: players {len(board):,}, events {len(events):,}: {len(events) / elapsed:,.0f} events/s "
+          f"({elapsed / len(events) * 1e6:.1f} us/event)")
+
+    t0 = time.perf_counter()
+    for _ in range(args.views):
+        board._synced = None
+        board.sync()
+    print(f"refresh (top {args.k} + player count): {(time.perf_counter() - t0) / args.views * 1e3:,.2f} ms")
+
+    ranked = board.store.rank_top(board.BOARD, len(board))
+    for label, pid in (("top", ranked[0]), ("middle", ranked[len(ranked) // 2]), ("bottom", ranked[-1])):
+        t0 = time.perf_counter()
+        for _ in range(args.views):
+            rank, _ = board.player(pid)
+        print(f"viewer at the {label} (rank {rank:,}): {(time.perf_counter() - t0) / args.views * 1e3:,.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
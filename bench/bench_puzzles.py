@@ -0,0 +1,51 @@
+"""
+Puzzles per second: old start_puzzle() generation vs the PuzzleBank.
+
+    python bench/bench_puzzles.py [--n 200000] [--depth 256]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from puzzles import PuzzleBank, gen_firewall, gen_keypad, gen_wires  # noqa: E402
+
+
+def old_way():
+    # what start_puzzle() used to do: build all three, keep one
+    return random.choice([gen_wires(), gen_keypad(), gen_firewall()])
+
+
+def rate(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return n / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200000)
+    ap.add_argument("--depth", type=int, default=256)
+    args = ap.parse_args()
+
+    bank = PuzzleBank(depth=args.depth, background=False)
+    bank.fill()
+    threaded = PuzzleBank(depth=args.depth)
+    threaded.fill()
+
+    rows = [
+        ("old: build 3, keep 1", rate(old_way, args.n)),
+        ("bank (inline refill)", rate(bank.draw, args.n)),
+        ("bank (background refill)", rate(threaded.draw, args.n)),
+    ]
+    base = rows[0][1]
+    for name, r in rows:
+        print(f"{name:<28} {r:>12,.0f} puzzles/s  x{r / base:.1f}")
+
+
+if __name__ == "__main__":
+    main()
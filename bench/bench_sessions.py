@@ -0,0 +1,95 @@
+"""
+Signed-cookie sessions vs server-side sessions.
+
+Plays the same hacker loop (GET /hack, new, submit, GET /system) with each
+session backend and reports cookie bytes sent up per request, Set-Cookie
+bytes sent down per response and time per request; then times the session
+work alone (open + read + write + save) outside of the routes.
+
+    python bench/bench_sessions.py [--rounds 2000]
+
+One run here (Python 3, test client, in-memory store):
+
+    sessions    cookie B/req  set-cookie B/resp  us/request  session us
+    cookie               129                 88        1073       179.1
+    server                40                  0         706        64.8
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+from werkzeug.test import EnvironBuilder
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["COOLDOWN_SECONDS"] = "0"
+os.environ["RATE_LIMIT"] = "off"
+
+import app as game  # noqa: E402
+from puzzles import answer_for  # noqa: E402
+from sessions import make_session_interface  # noqa: E402
+
+DESC_RE = re.compile(r"<p><em>(.*?)</em></p>")
+COOKIE = game.app.config["SESSION_COOKIE_NAME"]
+
+
+def play(rounds):
+    client = game.app.test_client()
+    requests = up = down = 0
+
+    def call(method, path, data=None):
+        nonlocal requests, up, down
+        cookie = client.get_cookie(COOKIE)
+        up += len(f"{COOKIE}={cookie.value}") if cookie else 0
+        r = client.open(path, method=method, data=data)
+        down += sum(len(v) for v in r.headers.getlist("Set-Cookie"))
+        requests += 1
+        return r.get_data(as_text=True)
+
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        call("GET", "/hack")
+        page = call("POST", "/hack", {"action": "new"})
+        m = DESC_RE.search(page)
+        call("POST", "/hack", {"action": "submit", "answer": answer_for(m.group(1)) if m else "?"})
+        call("GET", "/system")
+    elapsed = time.perf_counter() - t0
+    return requests, up / requests, down / requests, elapsed / requests * 1e6
+
+
+def session_only(n):
+    """Per-request session cost: open, read, change one key, save (no routing, no context)."""
+    app = game.app
+    iface = app.session_interface
+    s = iface.open_session(app, app.request_class(EnvironBuilder("/").get_environ()))
+    s.update({"room": "main", "p_token": "x" * 22, "p_system": "keypad", "p_desc": "d" * 60,
+              "hack_cooldown_until": time.time()})
+    resp = app.response_class()
+    iface.save_session(app, s, resp)
+    environ = EnvironBuilder("/", headers={"Cookie": resp.headers["Set-Cookie"].split(";")[0]}).get_environ()
+
+    t0 = time.perf_counter()
+    for i in range(n):
+        s = iface.open_session(app, app.request_class(dict(environ)))
+        s.get("p_token")
+        s["hack_cooldown_until"] = i
+        iface.save_session(app, s, app.response_class())
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=2000)
+    ap.add_argument("--n", type=int, default=20000)
+    args = ap.parse_args()
+
+    print(f"{'sessions':<10} {'cookie B/req':>13} {'set-cookie B/resp':>18} {'us/request':>11} {'session us':>11}")
+    for backend in ("cookie", "server"):
+        game.app.session_interface = make_session_interface(game.BASE_STORE, backend)
+        _, up, down, us = play(args.rounds)
+        print(f"{backend:<10} {up:>13.0f} {down:>18.0f} {us:>11.0f} {session_only(args.n):>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
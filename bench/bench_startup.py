@@ -0,0 +1,173 @@
+"""
+Cold start: import time, boot (warm-up) time and first-request latency.
+
+Each sample is a fresh interpreter, so nothing is cached between runs:
+
+  in-process   `import app` with WARM_START=1 (create_app() warms everything)
+               and WARM_START=0, then the first and second GET of a few pages
+               through the test client. The first request on a cold app pays
+               for template compiles, the puzzle bank and the room build.
+  gunicorn     the real server (gunicorn_conf.py, gevent, WEB_CONCURRENCY
+               workers) with and without preload: time until /ready answers
+               200, the first GET /hack, and each worker's private (unshared)
+               memory, i.e. what copy-on-write did not manage to share.
+
+    python bench/bench_startup.py [--runs 5] [--workers 2] [--no-gunicorn]
+
+One run here (medians of 5 interpreters and 2 server starts, in-memory store):
+
+    in-process       import ms  boot ms  first / ms  first /hack ms  second /hack ms
+    WARM_START=1         281.6     55.6         2.4             1.3              1.0
+    WARM_START=0         270.3      0.0        16.7            11.1              1.1
+    boot steps (ms): templates 49.4, puzzles 0.4, rooms 0.1, static 0.2, routes 1.8
+
+    gunicorn (2 workers)    ready ms  first /hack ms  private MB/worker
+    preload                      508             3.8                6.2
+    no preload                   880             5.8               20.1
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PAGES = ("/", "/hack", "/hack")
+
+CHILD = """
+import json, time
+t = time.perf_counter()
+import app
+imported = time.perf_counter() - t
+client = app.app.test_client()
+first = {}
+for path in %r:
+    t = time.perf_counter()
+    client.get(path)
+    first.setdefault(path, []).append(time.perf_counter() - t)
+print(json.dumps({"import": imported, "boot": app.BOOT, "pages": first}))
+""" % (PAGES,)
+
+
+def env(**extra):
+    e = dict(os.environ, COOLDOWN_SECONDS="0", RATE_LIMIT="off", **extra)
+    e.pop("STATE_BACKEND", None)
+    return e
+
+
+def in_process(warm, runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", CHILD], cwd=ROOT, env=env(WARM_START=warm),
+            check=True, capture_output=True, text=True,
+        ).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    med = lambda values: statistics.median(values) * 1e3  # noqa: E731
+    steps = {name: med([s["boot"].get(name, 0.0) for s in samples]) for name in samples[0]["boot"]}
+    row = {
+        "import": med([s["import"] - s["boot"]["total"] for s in samples]),
+        "boot": med([s["boot"]["total"] for s in samples]) if warm == "1" else 0.0,
+        "first /": med([s["pages"]["/"][0] for s in samples]),
+        "first /hack": med([s["pages"]["/hack"][0] for s in samples]),
+        "second /hack": med([s["pages"]["/hack"][1] for s in samples]),
+    }
+    return row, steps
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get(url):
+    t = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=5) as r:
+            r.read()
+            status = r.status
+    except urllib.error.HTTPError as exc:
+        status = exc.code
+    except OSError:
+        status = None
+    return status, time.perf_counter() - t
+
+
+def private_mb(pid):
+    """Private_Clean + Private_Dirty: the pages this process does not share."""
+    total = 0
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                total += int(line.split()[1])
+    return total / 1024
+
+
+def workers_of(pid):
+    children = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            children += [int(c) for c in f.read().split()]
+    return children
+
+
+def gunicorn(preload, workers):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn_conf.py", "serve_async:app"],
+        cwd=ROOT, env=env(PORT=str(port), PRELOAD_APP=preload, WEB_CONCURRENCY=str(workers)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while get(base + "/ready")[0] != 200:
+            if proc.poll() is not None or time.perf_counter() - t0 > 30:
+                raise RuntimeError("gunicorn did not become ready")
+            time.sleep(0.01)
+        ready = time.perf_counter() - t0
+        # a new connection per request, so the kernel spreads them over the workers
+        first = max(get(base + "/hack")[1] for _ in range(workers * 2))
+        time.sleep(0.5)
+        pids = workers_of(proc.pid)
+        memory = statistics.mean(private_mb(pid) for pid in pids) if pids else float("nan")
+        return ready * 1e3, first * 1e3, memory
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--no-gunicorn", action="store_true")
+    args = ap.parse_args()
+
+    print(f"{'in-process':<14}{'import ms':>12}{'boot ms':>9}{'first / ms':>12}{'first /hack ms':>16}{'second /hack ms':>17}")
+    steps = None
+    for warm in ("1", "0"):
+        row, boot = in_process(warm, args.runs)
+        steps = steps or boot
+        print(f"{'WARM_START=' + warm:<14}{row['import']:>12.1f}{row['boot']:>9.1f}{row['first /']:>12.1f}"
+              f"{row['first /hack']:>16.1f}{row['second /hack']:>17.1f}")
+    print("boot steps (ms): " + ", ".join(f"{k} {v:.1f}" for k, v in steps.items() if k != "total"))
+
+    if args.no_gunicorn:
+        return
+    print()
+    print(f"{f'gunicorn ({args.workers} workers)':<22}{'ready ms':>10}{'first /hack ms':>16}{'private MB/worker':>19}")
+    for label, preload in (("preload", "1"), ("no preload", "0")):
+        runs = [gunicorn(preload, args.workers) for _ in range(max(1, args.runs // 2))]
+        ready, first, memory = (statistics.median(col) for col in zip(*runs))
+        print(f"{label:<22}{ready:>10.0f}{first:>16.1f}{memory:>19.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Load test for the game flows.
+
+Simulated players run scripted sessions against the real pages, each with
+its own cookie jar:
+
+  hacker:    GET /hack -> new -> (reroll) -> submit right/wrong or cancel
+             -> black market sell -> now and then GET /system
+  defender:  log in -> logs -> cancel_detection -> Increase Defense -> logout
+
+Reports requests/s and p50/p95/p99 latency per route+action and can save
+that as a JSON baseline; --compare prints the change against an older one.
+
+    python bench/loadtest.py --clients 20 --duration 15 --out bench/baselines/testclient.json
+    python bench/loadtest.py --gunicorn sync --workers 2 --compare bench/baselines/testclient.json
+
+In-process runs use Flask's test client (no network, measures the app);
+--gunicorn starts a real local server and goes over HTTP. The cooldown is
+switched off (COOLDOWN_SECONDS=0) so players don't just sit and wait, and so
+are the per-client rate limits (RATE_LIMIT=off): every player shares one IP.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+os.environ["COOLDOWN_SECONDS"] = "0"
+os.environ["RATE_LIMIT"] = "off"
+
+from puzzles import answer_for  # noqa: E402
+
+DESC_RE = re.compile(r"<p><em>(.*?)</em></p>")
+
+
+# ======= TRANSPORTS =======
+class TestClientTransport:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        if method == "GET":
+            r = self.client.get(path)
+        else:
+            r = self.client.post(path, data=data)
+        return r.status_code, r.get_data(as_text=True)
+
+
+class HTTPTransport:
+    def __init__(self, base):
+        self.base = base
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+        )
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        try:
+            with self.opener.open(self.base + path, data=body, timeout=30) as r:
+                return r.status, r.read().decode()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode()
+
+
+# ======= PLAYERS =======
+class Player:
+    def __init__(self, transport, room, rng):
+        self.t = transport
+        self.room = room
+        self.rng = rng
+        self.samples = []  # (label, seconds, ok)
+
+    def call(self, label, method, path, data=None):
+        t0 = time.perf_counter()
+        status, text = self.t.request(method, path, data)
+        self.samples.append((label, time.perf_counter() - t0, status < 400))
+        return text
+
+    def join(self):
+        self.call("GET /", "GET", f"/?room={self.room}")
+
+
+class Hacker(Player):
+    def session(self):
+        page = self.call("GET /hack", "GET", "/hack")
+        if "Start Hack" in page:
+            page = self.call("POST /hack new", "POST", "/hack", {"action": "new"})
+        if self.rng.random() < 0.1:
+            page = self.call("POST /hack reroll", "POST", "/hack", {"action": "reroll"})
+
+        m = DESC_RE.search(page)
+        roll = self.rng.random()
+        if m and roll < 0.7:
+            self.call("POST /hack submit", "POST", "/hack", {"action": "submit", "answer": answer_for(m.group(1)) or "?"})
+        elif roll < 0.9:
+            self.call("POST /hack submit", "POST", "/hack", {"action": "submit", "answer": "wrong"})
+        else:
+            self.call("POST /hack cancel", "POST", "/hack", {"action": "cancel"})
+
+        if self.rng.random() < 0.5:
+            self.call("POST /black-market", "POST", "/black-market", {"gb": str(self.rng.choice([3, 6, 9]))})
+        if self.rng.random() < 0.2:
+            self.call("GET /system", "GET", "/system")
+
+
+class Defender(Player):
+    def session(self):
+        self.call("POST /login choose", "POST", "/login", {"action": "choose", "defense": "keypad", "def_pass": "124578"})
+        self.call("POST /login logs", "POST", "/login", {"action": "logs"})
+        self.call("POST /login cancel_detection", "POST", "/login", {"action": "cancel_detection"})
+        self.call("POST /login download", "POST", "/login", {"action": "download"})
+        self.call("POST /login logout", "POST", "/login", {"action": "logout"})
+        time.sleep(self.rng.uniform(0, 0.05))
+
+
+# ======= RUN + REPORT =======
+def pct(sorted_vals, q):
+    return sorted_vals[min(len(sorted_vals) - 1, int(len(sorted_vals) * q))]
+
+
+def summarize(samples, elapsed):
+    by_route = {}
+    for label, sec, ok in samples:
+        by_route.setdefault(label, []).append((sec, ok))
+    routes = {}
+    for label, rows in sorted(by_route.items()):
+        lat = sorted(sec for sec, _ in rows)
+        routes[label] = {
+            "count": len(rows),
+            "errors": sum(1 for _, ok in rows if not ok),
+            "rps": round(len(rows) / elapsed, 1),
+            "p50_ms": round(pct(lat, 0.50) * 1000, 3),
+            "p95_ms": round(pct(lat, 0.95) * 1000, 3),
+            "p99_ms": round(pct(lat, 0.99) * 1000, 3),
+        }
+    lat = sorted(sec for _, sec, _ in samples) or [0]
+    total = {
+        "count": len(samples),
+        "errors": sum(1 for *_, ok in samples if not ok),
+        "rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(pct(lat, 0.50) * 1000, 3),
+        "p95_ms": round(pct(lat, 0.95) * 1000, 3),
+        "p99_ms": round(pct(lat, 0.99) * 1000, 3),
+    }
+    return routes, total
+
+
+def print_table(routes, total, old=None):
+    head = f"{'route':<30} {'count':>7} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    print(head + ("   p95 vs baseline" if old else ""))
+    rows = list(routes.items()) + [("TOTAL", total)]
+    for label, r in rows:
+        line = f"{label:<30} {r['count']:>7} {r['errors']:>4} {r['rps']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8}"
+        base = (old or {}).get("routes", {}).get(label) if label != "TOTAL" else (old or {}).get("total")
+        if base and base["p95_ms"]:
+            change = (r["p95_ms"] - base["p95_ms"]) / base["p95_ms"] * 100
+            line += f"   {change:+.0f}%"
+        print(line)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=20)
+    ap.add_argument("--defenders", type=int, default=2, help="how many of the clients play defender")
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--rooms", type=int, default=1, help="spread players over this many rooms")
+    ap.add_argument("--gunicorn", choices=["sync", "gevent"], help="run against a real local gunicorn")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--port", type=int, default=8766)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="write results as a JSON baseline")
+    ap.add_argument("--compare", help="baseline JSON to diff against")
+    args = ap.parse_args()
+
+    proc = None
+    if args.gunicorn:
+        from bench_concurrency import MODES, start_server
+        if args.workers > 1:
+            MODES["sync"] = MODES["sync"][:2] + [str(args.workers)] + MODES["sync"][3:]
+            os.environ["WEB_CONCURRENCY"] = str(args.workers)
+        proc = start_server(args.gunicorn, args.port)
+        make_transport = lambda: HTTPTransport(f"http://127.0.0.1:{args.port}")  # noqa: E731
+    else:
+        import app as game
+        make_transport = lambda: TestClientTransport(game.app)  # noqa: E731
+
+    players = []
+    for i in range(args.clients):
+        cls = Defender if i < args.defenders else Hacker
+        players.append(cls(make_transport(), f"load{i % args.rooms}", random.Random(args.seed + i)))
+
+    stop = time.perf_counter() + args.duration
+
+    def drive(p):
+        p.join()
+        p.samples.clear()
+        while time.perf_counter() < stop:
+            p.session()
+
+    try:
+        threads = [threading.Thread(target=drive, args=(p,)) for p in players]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - t0
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    samples = [s for p in players for s in p.samples]
+    routes, total = summarize(samples, elapsed)
+    old = None
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+    print_table(routes, total, old)
+
+    if args.out:
+        result = {
+            "meta": {
+                "target": f"gunicorn-{args.gunicorn} x{args.workers}" if args.gunicorn else "flask-test-client",
+                "clients": args.clients,
+                "defenders": args.defenders,
+                "rooms": args.rooms,
+                "duration_s": round(elapsed, 2),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+            },
+            "routes": routes,
+            "total": total,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
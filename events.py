@@ -0,0 +1,212 @@
+"""
+Append-only event log for the in-memory game state.
+
+Every counter change becomes one compact JSON line:
+
+    [seq, unix_ms, cause, key, new_value]
+
+cause says what did it ("hack:submit", "login:cancel_detection", ...).
+Values are absolute, so replaying an event twice is harmless.
+
+Requests never wait on the disk: append() just queues the event, and a
+writer thread wakes every `flush_interval` seconds, writes everything
+queued in one go and fsyncs once (group commit). Every `snapshot_every`
+events it also writes snapshot.json and starts a new segment file, so a
+restart loads the snapshot and replays only the segments after it.
+
+    python events.py replay <dir>     # replay everything, report events/sec
+"""
+import fcntl
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+SNAPSHOT = "snapshot.json"
+
+
+def _segments(directory):
+    """[(first_seq, path)] oldest first."""
+    out = []
+    for name in os.listdir(directory):
+        if name.startswith("events-") and name.endswith(".log"):
+            out.append((int(name[7:-4]), os.path.join(directory, name)))
+    return sorted(out)
+
+
+def read_events(path):
+    """Yield events from one segment; a half-written last line (crash mid-write) is skipped."""
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            yield json.loads(line)
+
+
+def load_snapshot(directory):
+    path = os.path.join(directory, SNAPSHOT)
+    if not os.path.exists(path):
+        return 0, {}
+    with open(path) as f:
+        snap = json.load(f)
+    return snap["seq"], snap["state"]
+
+
+def tail_segments(directory, after_seq):
+    """Segments that can hold events newer than after_seq."""
+    segs = _segments(directory)
+    keep = []
+    for i, (start, path) in enumerate(segs):
+        nxt = segs[i + 1][0] if i + 1 < len(segs) else None
+        if nxt is not None and nxt <= after_seq + 1:
+            continue
+        keep.append(path)
+    return keep
+
+
+def restore(directory):
+    """Latest snapshot plus the tail of the log. Returns (last_seq, state)."""
+    seq, state = load_snapshot(directory)
+    for path in tail_segments(directory, seq):
+        for ev in read_events(path):
+            if ev[0] > seq:
+                state[ev[3]] = ev[4]
+                seq = ev[0]
+    return seq, state
+
+
+class EventLog:
+    def __init__(self, directory, flush_interval=0.05, snapshot_every=10000):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+        # one writer per directory: a second worker on the same log would interleave two games
+        self._lock_file = open(os.path.join(directory, ".lock"), "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise RuntimeError(f"Event log {directory} is already in use by another process")
+        # the lock belongs to this process; a forked copy must not write (see append)
+        self._pid = os.getpid()
+        self.seq, self._state = restore(directory)
+        self._since_snapshot = 0
+        self._pending = deque()
+        # rooms have a lock each but share this log: seq + queue order must be one step
+        self._append_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._file = None
+
+    def state(self, prefix=""):
+        """
+        Current logged state for the keys directly under prefix, with the prefix
+        stripped ("" = the main game, "<room>/" = one room). Used to seed a store.
+        """
+        with self._flush_lock:
+            return {
+                k[len(prefix):]: v for k, v in self._state.items()
+                if k.startswith(prefix) and "/" not in k[len(prefix):]
+            }
+
+    # ---- request path ----
+    def append(self, cause, key, value):
+        """Queue one change. Call it in the same order the changes were applied."""
+        if os.getpid() != self._pid:
+            # opened before a fork (gunicorn preload): the children would share one log
+            raise RuntimeError(f"Event log {self.directory} was opened by process {self._pid}, not this one")
+        with self._append_lock:
+            self.seq += 1
+            self._pending.append([self.seq, int(time.time() * 1000), cause, key, value])
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+            self._thread.start()
+
+    # ---- writer thread ----
+    def _open_segment(self, first_seq):
+        if self._file:
+            self._file.close()
+        path = os.path.join(self.directory, f"events-{first_seq:012d}.log")
+        self._file = open(path, "ab")
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        batch = []
+        while self._pending:
+            batch.append(self._pending.popleft())
+        if not batch:
+            return
+        if self._file is None:
+            self._open_segment(batch[0][0])
+        self._file.write(b"".join(json.dumps(ev, separators=(",", ":")).encode() + b"\n" for ev in batch))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        for ev in batch:
+            self._state[ev[3]] = ev[4]
+        self._since_snapshot += len(batch)
+        if self._since_snapshot >= self.snapshot_every:
+            self.snapshot(batch[-1][0])
+
+    def snapshot(self, seq):
+        """Write snapshot.json atomically, then start a new segment after it."""
+        path = os.path.join(self.directory, SNAPSHOT)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"seq": seq, "state": self._state}, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        self._open_segment(seq + 1)
+        self._since_snapshot = 0
+
+    def close(self):
+        with self._flush_lock:
+            self._flush()
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+# ======= REPLAY TOOL =======
+def replay(directory):
+    """Replay every segment from scratch; report speed, final state and event causes."""
+    causes = Counter()
+    state = {}
+    n = 0
+    t0 = time.perf_counter()
+    for _, path in _segments(directory):
+        for ev in read_events(path):
+            state[ev[3]] = ev[4]
+            causes[ev[2]] += 1
+            n += 1
+    elapsed = time.perf_counter() - t0
+
+    t1 = time.perf_counter()
+    _, restored = restore(directory)
+    restore_time = time.perf_counter() - t1
+
+    print(f"events:        {n:,}")
+    print(f"full replay:   {elapsed:.3f}s  ({n / elapsed if elapsed else 0:,.0f} events/s)")
+    print(f"restore:       {restore_time:.3f}s  (snapshot + tail)")
+    print(f"state matches: {restored == state}")
+    print("state:", json.dumps(state, sort_keys=True))
+    for cause, count in causes.most_common():
+        print(f"  {cause:<32} {count:,}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "replay":
+        sys.exit("usage: python events.py replay <event-log-dir>")
+    replay(sys.argv[2])
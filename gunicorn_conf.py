@@ -0,0 +1,41 @@
+# gunicorn settings for the gevent (high-concurrency) mode. Used by the Procfile:
+#   gunicorn -c gunicorn_conf.py serve_async:app
+import gc
+import os
+
+worker_class = "gevent"
+# each worker multiplexes this many connections on greenlets (idle keep-alives,
+# slow uploads and /api/v1/stream subscribers all count)
+worker_connections = int(os.environ.get("WORKER_CONNECTIONS", "1000"))
+# more than one worker only shares the game with a shared STATE_BACKEND (sqlite:// or redis://);
+# under gevent SQLite calls run on the hub threadpool, so a held write lock only stalls its own request
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+keepalive = 5
+# SSE streams stay open; gevent workers heartbeat on their own, so this only catches real hangs
+timeout = 60
+graceful_timeout = 10
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+# import and warm the app once in the master (templates compiled, puzzle bank
+# filled, default room loaded); workers fork from it and share those pages
+# copy-on-write instead of each paying the cold start. PRELOAD_APP=0 to turn off.
+# Not with EVENT_LOG_DIR: the log (its one-writer lock, its seq and the restored
+# game) would be opened in the master, so every worker, and every worker gunicorn
+# restarts later, would write from that same boot-time copy.
+preload_app = os.environ.get("PRELOAD_APP", "0" if os.environ.get("EVENT_LOG_DIR") else "1") != "0"
+if preload_app and os.environ.get("EVENT_LOG_DIR"):
+    raise RuntimeError("PRELOAD_APP=1 can't be combined with EVENT_LOG_DIR; unset one of them")
+
+
+def on_starting(server):
+    # METRICS_DIR holds one dump per worker pid; drop the ones left by a previous run
+    metrics_dir = os.environ.get("METRICS_DIR")
+    if metrics_dir and os.path.isdir(metrics_dir):
+        for name in os.listdir(metrics_dir):
+            if name.endswith(".json") or name.endswith(".tmp"):
+                os.remove(os.path.join(metrics_dir, name))
+
+
+def pre_fork(server, worker):
+    # move everything the master built into the permanent generation, so the
+    # children's collections don't touch (and copy) those shared pages
+    gc.freeze()
@@ -0,0 +1,267 @@
+"""
+Per-player stats and the leaderboard.
+
+Every player has one account: intel earned (successful hacks), credits
+earned (black market sales) and success/fail per system. Players are
+ranked by intel, then credits, in a SortedList of (-intel, -credits, id)
+keys, so an update is one remove + one add (O(log n)) and a player's rank
+is one bisect (O(log n)). Nothing is scanned or re-sorted on a page view.
+
+Accounts are capped at `max_players`: past it the lowest-ranked account
+is dropped (the bottom of the ranking is players who never scored, e.g. a
+session that failed one hack and left), so the board stays bounded however
+many sessions come and go.
+
+`version` only moves when the top K changes (someone enters, leaves or
+moves inside it, or a top-K player's numbers change), so anything built
+from top() can be cached against it.
+
+Where the accounts live follows the game (make_leaderboard):
+
+  in-process game:  in this process, like the rooms and their live feeds
+  shared game:      one record per player in the STATE_BACKEND, updated
+                    atomically with update_record(), so every worker counts
+                    into the same accounts and they survive a restart. The
+                    ranking is kept by the backend too (a Redis sorted set or
+                    an indexed SQLite table, see StateStore.rank_*): an event
+                    is one record update + one rank write, the top K is one
+                    ORDER BY ... LIMIT k / ZRANGE, re-read at most every
+                    `refresh` seconds, and the viewer's rank and account are
+                    always read fresh. Nothing is ever scanned.
+"""
+import threading
+import time
+
+from sortedcontainers import SortedList
+
+from state_store import MemoryStore
+
+
+class Player:
+    __slots__ = ("id", "name", "intel", "credits", "systems")
+
+    def __init__(self, player_id, name):
+        self.id = player_id
+        self.name = name
+        self.intel = 0
+        self.credits = 0
+        # system -> [success, fail]
+        self.systems = {}
+
+    def key(self):
+        return (-self.intel, -self.credits, self.id)
+
+    def hacks(self):
+        success = sum(s for s, _ in self.systems.values())
+        fail = sum(f for _, f in self.systems.values())
+        return success, fail
+
+    def load(self, record):
+        self.name = record["name"]
+        self.intel = record["intel"]
+        self.credits = record["credits"]
+        self.systems = {name: list(counts) for name, counts in record["systems"].items()}
+
+    def as_dict(self):
+        success, fail = self.hacks()
+        return {
+            "name": self.name,
+            "intel": self.intel,
+            "credits": self.credits,
+            "success": success,
+            "fail": fail,
+            "systems": {name: {"success": s, "fail": f} for name, (s, f) in sorted(self.systems.items())},
+        }
+
+
+class Leaderboard:
+    def __init__(self, k=10, max_players=100000):
+        self.k = k
+        self.max_players = max(k, max_players)
+        self._players = {}
+        self._ranking = SortedList()
+        self._lock = threading.Lock()
+        self.version = 0
+        self._top = None
+        self.dropped = 0
+
+    def _in_top(self, key):
+        return self._ranking.bisect_left(key) < self.k
+
+    def _changed(self):
+        self.version += 1
+        self._top = None
+
+    def _update(self, player_id, name, change):
+        # call with self._lock held; change(player) edits the account in place
+        player = self._players.get(player_id)
+        if player is None:
+            player = self._players[player_id] = Player(player_id, name)
+            was_top = False
+        else:
+            old = player.key()
+            was_top = self._in_top(old)
+            self._ranking.remove(old)
+        change(player)
+        key = player.key()
+        self._ranking.add(key)
+        if was_top or self._in_top(key):
+            self._changed()
+        if len(self._players) > self.max_players:
+            # never the top K: max_players >= k
+            del self._players[self._ranking.pop()[2]]
+            self.dropped += 1
+
+    def record(self, player_id, name, intel=0, credits=0, system=None, success=None):
+        """Add one event to a player's account (creating it on first sight)."""
+        def change(player):
+            player.name = name
+            player.intel += intel
+            player.credits += credits
+            if system is not None:
+                counts = player.systems.setdefault(system, [0, 0])
+                counts[0 if success else 1] += 1
+
+        with self._lock:
+            self._update(player_id, name, change)
+
+    def sync(self):
+        """Nothing to pick up: every change to this board happens in this process."""
+
+    def rename(self, player_id, name):
+        with self._lock:
+            player = self._players.get(player_id)
+            if player is None or player.name == name:
+                return
+            player.name = name
+            if self._in_top(player.key()):
+                self._changed()
+
+    def top(self):
+        """The top K as dicts (rank first). Built once per version."""
+        with self._lock:
+            if self._top is None:
+                self._top = [
+                    dict(self._players[key[2]].as_dict(), rank=i + 1)
+                    for i, key in enumerate(self._ranking.islice(0, self.k))
+                ]
+            return self._top
+
+    def player(self, player_id):
+        """(rank, stats dict) or (None, None) for someone who hasn't played yet."""
+        with self._lock:
+            player = self._players.get(player_id)
+            if player is None:
+                return None, None
+            return self._ranking.index(player.key()) + 1, player.as_dict()
+
+    def __len__(self):
+        return len(self._players)
+
+
+def score(intel, credits):
+    """Intel first, credits as the tie-break, in one number (exact while intel < 2**29)."""
+    return intel * 2 ** 24 + min(credits, 2 ** 24 - 1)
+
+
+class SharedLeaderboard:
+    """Same interface as Leaderboard; accounts and ranking live in a shared store."""
+
+    PREFIX = "player:"
+    BOARD = "leaderboard"
+    # every worker trims the board to max_players after this many of its own events
+    TRIM_EVERY = 256
+
+    def __init__(self, store, k=10, refresh=2.0, max_players=100000):
+        self.store = store
+        self.k = k
+        self.refresh = refresh
+        self.max_players = max(k, max_players)
+        self._events = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._synced = None
+        self._top = []
+        self._count = 0
+        self.version = 0
+
+    def sync(self):
+        """Re-read the top K and the player count (at most every `refresh` seconds)."""
+        now = time.monotonic()
+        with self._lock:
+            if self._synced is not None and now - self._synced < self.refresh:
+                return
+            self._synced = now
+        top = []
+        for i, player_id in enumerate(self.store.rank_top(self.BOARD, self.k)):
+            record = self.store.get_record(self.PREFIX + player_id)
+            if record is not None:
+                top.append(dict(self._stats(player_id, record), rank=i + 1))
+        count = self.store.rank_count(self.BOARD)
+        with self._lock:
+            if top != self._top:
+                self._top = top
+                self.version += 1
+            self._count = count
+
+    @staticmethod
+    def _stats(player_id, record):
+        player = Player(player_id, record["name"])
+        player.load(record)
+        return player.as_dict()
+
+    def record(self, player_id, name, intel=0, credits=0, system=None, success=None):
+        def change(record):
+            record = record or {"name": name, "intel": 0, "credits": 0, "systems": {}}
+            record["name"] = name
+            record["intel"] += intel
+            record["credits"] += credits
+            if system is not None:
+                counts = record["systems"].setdefault(system, [0, 0])
+                counts[0 if success else 1] += 1
+            return record, record
+
+        record = self.store.update_record(self.PREFIX + player_id, change)
+        # scores only grow and rank_add never lowers one, so racing workers still end on the latest
+        self.store.rank_add(self.BOARD, player_id, score(record["intel"], record["credits"]))
+        self._events += 1
+        if self._events % self.TRIM_EVERY == 0:
+            self.trim()
+
+    def trim(self):
+        """Drop the lowest-ranked accounts past max_players."""
+        for player_id in self.store.rank_trim(self.BOARD, self.max_players):
+            self.store.pop_record(self.PREFIX + player_id)
+            self.dropped += 1
+
+    def rename(self, player_id, name):
+        if self.store.get_record(self.PREFIX + player_id) is None:
+            return
+
+        def change(record):
+            record["name"] = name
+            return record, None
+
+        self.store.update_record(self.PREFIX + player_id, change)
+
+    def top(self):
+        self.sync()
+        return self._top
+
+    def player(self, player_id):
+        record = self.store.get_record(self.PREFIX + player_id)
+        rank = self.store.rank_of(self.BOARD, player_id) if record is not None else None
+        if rank is None:
+            return None, None
+        return rank + 1, self._stats(player_id, record)
+
+    def __len__(self):
+        self.sync()
+        return self._count
+
+
+def make_leaderboard(store, k=10, refresh=2.0, max_players=100000):
+    """In-process game -> a board in this process; shared game -> accounts next to STATE."""
+    if isinstance(store, MemoryStore):
+        return Leaderboard(k, max_players)
+    return SharedLeaderboard(store, k, refresh, max_players)
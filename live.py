@@ -0,0 +1,115 @@
+"""
+Live game state over Server-Sent Events.
+
+Each room has one feed, and one pump thread per feed watches the state and
+publishes a delta (only the keys that changed) each time something moves. Bursts are coalesced:
+after a change the pump waits `coalesce` seconds before diffing, so ten
+quick hacks go out as one message. Every subscriber reads from the same
+short history of deltas, so each delta is diffed and JSON-encoded once no
+matter how many clients are connected, and no client gets its own thread
+to produce data.
+
+Changes made in this process wake the pump straight away (notify()).
+Changes made by other workers are picked up by polling every `poll`
+seconds while anyone is subscribed.
+"""
+import json
+import threading
+import time
+from collections import deque
+
+
+def sse(data, event=None, id=None):
+    out = ""
+    if event:
+        out += f"event: {event}\n"
+    if id is not None:
+        out += f"id: {id}\n"
+    return out + f"data: {data}\n\n"
+
+
+class LiveFeed:
+    def __init__(self, snapshot_fn, coalesce=0.25, poll=1.0, heartbeat=15.0, history=64, idle_exit=60.0):
+        self.snapshot_fn = snapshot_fn
+        self.coalesce = coalesce
+        self.poll = poll
+        self.heartbeat = heartbeat
+        # the pump thread quits after this long without subscribers (rooms can be many)
+        self.idle_exit = idle_exit
+        self.version = 0
+        self.latest = None
+        # (version, delta dict, encoded json)
+        self._deltas = deque(maxlen=history)
+        self._cond = threading.Condition()
+        self._changed = threading.Event()
+        self._subscribers = 0
+        self._thread = None
+
+    def notify(self):
+        """Something changed here; push it out soon. Cheap enough to call on every request."""
+        if self._subscribers:
+            self._changed.set()
+
+    def _ensure_pump(self):
+        # call with self._cond held
+        if self.latest is None:
+            self.latest = self.snapshot_fn()
+        # threads don't survive a fork, so this also restarts it in each worker
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._pump, name="live-feed", daemon=True)
+            self._thread.start()
+
+    def _pump(self):
+        while True:
+            if not self._subscribers:
+                if not self._changed.wait(self.idle_exit):
+                    with self._cond:
+                        if not self._subscribers:
+                            self._thread = None
+                            return
+                    continue
+            else:
+                self._changed.wait(self.poll)
+            self._changed.clear()
+            time.sleep(self.coalesce)
+            snap = self.snapshot_fn()
+            with self._cond:
+                delta = {k: v for k, v in snap.items() if self.latest.get(k) != v}
+                if not delta:
+                    continue
+                self.version += 1
+                self.latest = snap
+                self._deltas.append((self.version, delta, json.dumps(delta, separators=(",", ":"))))
+                self._cond.notify_all()
+
+    def stream(self):
+        """Generator of SSE frames: one full snapshot, then deltas as they happen."""
+        with self._cond:
+            self._subscribers += 1
+            self._ensure_pump()
+            seen = self.version
+            first = sse(json.dumps(self.latest, separators=(",", ":")), event="snapshot", id=seen)
+        self._changed.set()
+        try:
+            yield first
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self.version > seen, timeout=self.heartbeat)
+                    pending = [d for d in self._deltas if d[0] > seen]
+                    if pending and pending[0][0] > seen + 1:
+                        # fell further behind than the history: start over from a snapshot
+                        frame = sse(json.dumps(self.latest, separators=(",", ":")), event="snapshot", id=self.version)
+                    elif len(pending) == 1:
+                        frame = sse(pending[0][2], id=pending[0][0])
+                    elif pending:
+                        merged = {}
+                        for _, delta, _ in pending:
+                            merged.update(delta)
+                        frame = sse(json.dumps(merged, separators=(",", ":")), id=pending[-1][0])
+                    else:
+                        frame = ": ping\n\n"
+                    seen = self.version
+                yield frame
+        finally:
+            with self._cond:
+                self._subscribers -= 1
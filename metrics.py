@@ -0,0 +1,236 @@
+"""
+Low-overhead Prometheus metrics.
+
+Recording never takes a lock: every OS thread writes into its own shard (a
+plain dict) and the shards are only added up when /metrics is scraped.
+Under gevent all greenlets share their OS thread's shard, which is safe
+because greenlets can't switch in the middle of a dict update.
+
+Several gunicorn workers: set METRICS_DIR to a directory they share. Each
+worker dumps its totals there every few seconds (and when it is scraped),
+and a scrape adds up every worker's file, so any worker can answer
+/metrics for all of them. Counters of a worker that died stay in the sum;
+its gauges are dropped.
+"""
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    from gevent.monkey import get_original
+    _ident = get_original("_thread", "get_ident")
+except ImportError:
+    from _thread import get_ident as _ident
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# real thread id -> {(metric name, label values): value}
+_shards = {}
+_retired = {}
+_shards_lock = threading.Lock()
+
+
+def _shard():
+    ident = _ident()
+    shard = _shards.get(ident)
+    if shard is None:
+        shard = {}
+        with _shards_lock:
+            _shards[ident] = shard
+            if len(_shards) > 256:
+                # the dev server starts a thread per request: fold dead threads early
+                _fold_dead()
+    return shard
+
+
+def _add_into(total, key, value):
+    if isinstance(value, list):
+        cur = total.get(key)
+        if cur is None:
+            total[key] = list(value)
+        else:
+            for i, v in enumerate(value):
+                cur[i] += v
+    else:
+        total[key] = total.get(key, 0) + value
+
+
+def _fold_dead():
+    # call with _shards_lock held
+    alive = sys._current_frames().keys()
+    for ident in [i for i in _shards if i not in alive]:
+        for key, value in _shards.pop(ident).items():
+            _add_into(_retired, key, value)
+
+
+def collect_local():
+    """This process's totals: {(name, labels): number or [bucket counts..., sum]}."""
+    with _shards_lock:
+        _fold_dead()
+        total = {}
+        for key, value in _retired.items():
+            _add_into(total, key, value)
+        for shard in list(_shards.values()):
+            for key, value in dict(shard).items():
+                _add_into(total, key, value)
+    return total
+
+
+# ======= METRIC TYPES =======
+REGISTRY = {}
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        REGISTRY[name] = self
+
+    def inc(self, *labels, amount=1):
+        shard = _shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        REGISTRY[name] = self
+
+    def observe(self, value, *labels):
+        shard = _shard()
+        key = (self.name, labels)
+        h = shard.get(key)
+        if h is None:
+            # one slot per bucket (not cumulative yet), one for +Inf, then the sum
+            h = shard[key] = [0] * (len(self.buckets) + 2)
+        h[bisect.bisect_left(self.buckets, value)] += 1
+        h[-1] += value
+
+
+# ======= MULTI-WORKER =======
+class WorkerDump:
+    """Writes this worker's totals (and gauges) to METRICS_DIR every `interval` seconds."""
+
+    def __init__(self, directory, gauges_fn, interval=5.0):
+        self.directory = directory
+        self.gauges_fn = gauges_fn
+        self.interval = interval
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+
+    def ensure_running(self):
+        # started lazily so each forked worker gets its own thread
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="metrics-dump", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.dump()
+
+    def dump(self, local=None, gauges=None):
+        local = collect_local() if local is None else local
+        gauges = self.gauges_fn() if gauges is None else gauges
+        data = {
+            "pid": os.getpid(),
+            "values": [[name, list(labels), value] for (name, labels), value in local.items()],
+            "gauges": [[name, list(labels), value] for (name, labels), value in gauges.items()],
+        }
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def collect_all(self, local, gauges):
+        """Every worker's counters summed; gauges from live workers, labelled by pid."""
+        self.dump(local, gauges)
+        total = {}
+        all_gauges = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue  # being replaced right now
+            for metric, labels, value in data["values"]:
+                _add_into(total, (metric, tuple(labels)), value)
+            if _pid_alive(data["pid"]):
+                for metric, labels, value in data["gauges"]:
+                    all_gauges[(metric, tuple(labels) + (str(data["pid"]),))] = value
+        return total, all_gauges
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+# ======= EXPOSITION =======
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _num(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def render(totals, gauges, gauge_help, gauge_labels):
+    """Prometheus text format (version 0.0.4)."""
+    lines = []
+    by_name = {}
+    for (name, labels), value in totals.items():
+        by_name.setdefault(name, []).append((labels, value))
+    for name, metric in REGISTRY.items():
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for labels, value in sorted(by_name.get(name, []), key=lambda r: r[0]):
+            if metric.kind == "counter":
+                lines.append(f"{name}{_fmt_labels(metric.labelnames, labels)} {_num(value)}")
+                continue
+            running = 0
+            for bound, count in zip(metric.buckets + ("+Inf",), value[:-1]):
+                running += count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                lines.append(f"{name}_bucket{_fmt_labels(metric.labelnames + ('le',), labels + (le,))} {running}")
+            lines.append(f"{name}_sum{_fmt_labels(metric.labelnames, labels)} {_num(value[-1])}")
+            lines.append(f"{name}_count{_fmt_labels(metric.labelnames, labels)} {running}")
+
+    by_gauge = {}
+    for (name, labels), value in gauges.items():
+        by_gauge.setdefault(name, []).append((labels, value))
+    for name, rows in sorted(by_gauge.items()):
+        lines.append(f"# HELP {name} {gauge_help.get(name, name)}")
+        lines.append(f"# TYPE {name} gauge")
+        names = gauge_labels.get(name, ())
+        for labels, value in sorted(rows):
+            # gauges gathered from several workers carry an extra pid label
+            label_names = names + ("pid",) if len(labels) > len(names) else names
+            lines.append(f"{name}{_fmt_labels(label_names, labels)} {_num(value)}")
+    return "\n".join(lines) + "\n"
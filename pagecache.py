@@ -0,0 +1,71 @@
+"""
+Rendered-page cache with strong ETags and pre-gzipped bodies.
+
+Pages that only depend on the room's counters are rendered once per
+(template, room, state version) and kept as both the plain body and its
+gzip, so a repeat view costs a dict lookup: no Jinja, no compression.
+Each representation has its own strong ETag (the gzip one ends in "-gz"),
+and a matching If-None-Match gets a 304 with no body at all.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response
+
+
+class Page:
+    __slots__ = ("body", "gz", "etag")
+
+    def __init__(self, html):
+        self.body = html.encode()
+        self.gz = gzip.compress(self.body, compresslevel=6, mtime=0)
+        self.etag = hashlib.blake2b(self.body, digest_size=12).hexdigest()
+
+
+class PageCache:
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, render):
+        """The cached page for key, rendering it with render() on a miss."""
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                self.hits += 1
+                return page
+        # render outside the lock; two concurrent misses just render twice
+        page = Page(render())
+        with self._lock:
+            self.misses += 1
+            self._pages[key] = page
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+        return page
+
+    def __len__(self):
+        return len(self._pages)
+
+
+def respond(page, request):
+    """304, gzip or plain, whichever the client can take."""
+    gz = "gzip" in request.headers.get("Accept-Encoding", "")
+    etag = page.etag + "-gz" if gz else page.etag
+    # either representation's tag proves the client has this version
+    if request.if_none_match.contains(page.etag) or request.if_none_match.contains(page.etag + "-gz"):
+        response = Response(status=304)
+    else:
+        response = Response(page.gz if gz else page.body, mimetype="text/html")
+        if gz:
+            response.headers["Content-Encoding"] = "gzip"
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    # always revalidate; the 304 makes that cheap
+    response.headers["Cache-Control"] = "no-cache"
+    return response
@@ -0,0 +1,157 @@
+"""
+Bounded puzzle token store.
+
+Tokens expire after a fixed TTL and the store never holds more than
+max_size of them (least recently used goes first). Expiry runs on a
+timing wheel: every token is dropped into the slot of the tick it expires
+on, and each call sweeps only the slots that have passed since the last
+call, so cleanup is amortized O(1) instead of scanning every token.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from state_store import MemoryStore, RecordMap
+
+
+def _approx_bytes(token, record):
+    size = sys.getsizeof(token) + sys.getsizeof(record)
+    if isinstance(record, dict):
+        for k, v in record.items():
+            size += sys.getsizeof(k) + sys.getsizeof(v)
+    else:
+        size += sum(sys.getsizeof(v) for v in record)
+    return size
+
+
+class PuzzleStore:
+    def __init__(self, ttl=900, max_size=10000, tick=1.0, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.tick = tick
+        self.clock = clock
+        self._lock = threading.Lock()
+        # token -> (record, expires_at, nbytes), oldest use first
+        self._data = OrderedDict()
+        # the wheel is one slot longer than the TTL, so a slot never mixes two rotations
+        self._wheel = [[] for _ in range(int(ttl // tick) + 2)]
+        self._swept = int(clock() // tick) - 1
+        self._bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # ---- internals (call with the lock held) ----
+    def _drop(self, token):
+        record, _, nbytes = self._data.pop(token)
+        self._bytes -= nbytes
+        return record
+
+    def _sweep(self, now):
+        """Expire every token whose tick is fully in the past."""
+        last = int(now // self.tick) - 1
+        if last <= self._swept:
+            return
+        n = len(self._wheel)
+        # after a long idle gap one full turn of the wheel covers everything
+        start = max(self._swept + 1, last - n + 1)
+        for t in range(start, last + 1):
+            slot = self._wheel[t % n]
+            if not slot:
+                continue
+            self._wheel[t % n] = []
+            for token in slot:
+                entry = self._data.get(token)
+                # the token may have been popped, or re-added into a later slot
+                if entry is not None and entry[1] <= now:
+                    self._drop(token)
+                    self.expirations += 1
+        self._swept = last
+
+    def _live(self, token, now):
+        entry = self._data.get(token)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            # expired inside the current tick, before the wheel got to it
+            self._drop(token)
+            self.expirations += 1
+            return None
+        return entry
+
+    # ---- dict-like API (same as RecordMap) ----
+    def __setitem__(self, token, record):
+        now = self.clock()
+        expires = now + self.ttl
+        nbytes = _approx_bytes(token, record)
+        with self._lock:
+            self._sweep(now)
+            if token in self._data:
+                self._drop(token)
+            self._data[token] = (record, expires, nbytes)
+            self._bytes += nbytes
+            self._wheel[int(expires // self.tick) % len(self._wheel)].append(token)
+            while len(self._data) > self.max_size:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def __contains__(self, token):
+        now = self.clock()
+        with self._lock:
+            self._sweep(now)
+            return self._live(token, now) is not None
+
+    def get(self, token, default=None):
+        now = self.clock()
+        with self._lock:
+            self._sweep(now)
+            entry = self._live(token, now)
+            if entry is None:
+                return default
+            self._data.move_to_end(token)
+            return entry[0]
+
+    def pop(self, token, default=None):
+        now = self.clock()
+        with self._lock:
+            self._sweep(now)
+            if self._live(token, now) is None:
+                return default
+            return self._drop(token)
+
+    def __len__(self):
+        with self._lock:
+            self._sweep(self.clock())
+            return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            self._sweep(self.clock())
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "approx_bytes": self._bytes,
+            }
+
+
+class SharedPuzzleStore(RecordMap):
+    """Puzzles in a shared backend; the backend expires them (SQLite sweep / Redis EX)."""
+
+    def __init__(self, store, ttl=900):
+        super().__init__(store, "puzzle:")
+        self.ttl = ttl
+
+    def __setitem__(self, token, record):
+        self.store.put_record(self.prefix + token, record, ttl=self.ttl)
+
+    def stats(self):
+        return {"size": self.store.count_records(self.prefix)}
+
+
+def make_puzzle_store(store, ttl=900, max_size=10000):
+    """In-process game -> bounded local store; shared game -> tokens live next to STATE."""
+    if isinstance(store, MemoryStore):
+        return PuzzleStore(ttl=ttl, max_size=max_size)
+    return SharedPuzzleStore(store, ttl=ttl)
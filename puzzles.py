@@ -0,0 +1,198 @@
+"""
+Puzzle rules and the pre-generated puzzle bank.
+
+The rules (same as the Training page) are written once as *_answer()
+functions. gen_wires/gen_keypad/gen_firewall build one random puzzle from
+them, and the tables below enumerate every puzzle each system can show,
+with the answer worked out once at import and a weight that reproduces
+the odds of the gen_* functions.
+
+PuzzleBank picks the system first and then pops a ready-made puzzle from
+that system's buffer, so nothing is generated and thrown away.
+"""
+import random
+import threading
+from collections import deque
+from itertools import accumulate, product
+
+SYSTEMS = ("wires", "keypad", "firewall")
+
+
+# ======= RULES (MATCH TRAINING) =======
+def wires_answer(lights, wires):
+    if lights == 2 and wires == ("red", "blue"):
+        return "connect red blue"
+    if lights == 2 and wires == ("green", "yellow"):
+        return "cut green"
+    if lights == 3:
+        return "disconnect all"
+    # 1 light: red plus another color -> cut the other one
+    return f"cut {wires[1]}"
+
+def wires_desc(lights, wires):
+    return f"Indicators: {lights} light{'s' if lights > 1 else ''} | wires: {wires[0]}, {wires[1]}"
+
+def keypad_answer(n):
+    if n == 9:
+        return "999"
+    if n % 2 == 0:
+        return str(n * 2)
+    return str(n + 3)
+
+def firewall_answer(pat):
+    start = pat[0]
+    if start == "A":
+        return pat[::-1]
+    if start == "B":
+        return pat + pat
+    if start == "C":
+        mid = len(pat) // 2
+        return pat[:mid] + pat[mid+1:]
+    return pat
+
+
+# ======= ONE-OFF GENERATORS =======
+def gen_wires():
+    case = random.choice(["two_rb", "two_gy", "three_any", "one_red_other"])
+    if case == "two_rb":
+        lights, wires = 2, ("red", "blue")
+    elif case == "two_gy":
+        lights, wires = 2, ("green", "yellow")
+    elif case == "three_any":
+        # show two random wires for flavor but expected remains 'disconnect all'
+        lights, wires = 3, tuple(random.sample(["red", "green", "blue", "yellow"], 2))
+    else:
+        lights, wires = 1, ("red", random.choice(["blue", "green", "yellow"]))
+    return {"system": "wires", "desc": wires_desc(lights, wires), "expected": wires_answer(lights, wires)}
+
+def gen_keypad():
+    n = random.randint(1, 9)
+    return {"system": "keypad", "desc": f"Indicator number: {n}", "expected": keypad_answer(n)}
+
+def gen_firewall():
+    start = random.choice("ABCD")
+    rest = "".join(random.choice("ABCDEF") for _ in range(2))
+    pat = (start + rest).upper()
+    return {"system": "firewall", "desc": f"Firewall pattern: {pat}", "expected": firewall_answer(pat)}
+
+GENERATORS = {"wires": gen_wires, "keypad": gen_keypad, "firewall": gen_firewall}
+
+
+# ======= TABLES (every puzzle, answer computed once) =======
+def _wires_table():
+    # weights out of 48 so they match gen_wires: 4 cases at 1/4 each, split evenly inside a case
+    rows = [((2, ("red", "blue")), 12), ((2, ("green", "yellow")), 12)]
+    colors = ["red", "green", "blue", "yellow"]
+    rows += [((3, (a, b)), 1) for a, b in product(colors, colors) if a != b]
+    rows += [((1, ("red", other)), 4) for other in ("blue", "green", "yellow")]
+    return [
+        ({"system": "wires", "desc": wires_desc(*args), "expected": wires_answer(*args)}, w)
+        for args, w in rows
+    ]
+
+def _keypad_table():
+    return [
+        ({"system": "keypad", "desc": f"Indicator number: {n}", "expected": keypad_answer(n)}, 1)
+        for n in range(1, 10)
+    ]
+
+def _firewall_table():
+    pats = [s + a + b for s in "ABCD" for a, b in product("ABCDEF", repeat=2)]
+    return [
+        ({"system": "firewall", "desc": f"Firewall pattern: {p}", "expected": firewall_answer(p)}, 1)
+        for p in pats
+    ]
+
+TABLES = {"wires": _wires_table(), "keypad": _keypad_table(), "firewall": _firewall_table()}
+
+# desc -> answer, for bots and benchmarks that need to solve what the page shows
+ANSWERS = {p["desc"]: p["expected"] for table in TABLES.values() for p, _ in table}
+
+def answer_for(desc):
+    return ANSWERS.get(desc)
+
+
+def parse_weights(text):
+    """'wires=2,keypad=1,firewall=1' -> {'wires': 2.0, ...}; unknown systems are an error."""
+    weights = {}
+    for part in filter(None, (p.strip() for p in (text or "").split(","))):
+        name, _, value = part.partition("=")
+        if name not in SYSTEMS:
+            raise ValueError(f"Unknown puzzle system in weights: {name}")
+        weights[name] = float(value)
+    return weights
+
+
+# ======= BANK =======
+class PuzzleBank:
+    """
+    One ring buffer per system, refilled a whole batch at a time.
+
+    When a buffer drops under a quarter full, a background thread tops it
+    back up (started lazily, so it is created after gunicorn forks). If a
+    buffer does run dry the caller refills it inline.
+    """
+
+    def __init__(self, weights=None, depth=256, background=True):
+        weights = {s: 1.0 for s in SYSTEMS} | dict(weights or {})
+        self.systems = [s for s in SYSTEMS if weights[s] > 0]
+        if not self.systems:
+            raise ValueError("At least one puzzle system needs a weight above 0")
+        self.cum_weights = list(accumulate(weights[s] for s in self.systems))
+        self.depth = depth
+        self.low_water = max(1, depth // 4)
+        self.background = background
+        self._tables = {
+            s: ([p for p, _ in TABLES[s]], list(accumulate(w for _, w in TABLES[s])))
+            for s in self.systems
+        }
+        self._rings = {s: deque(maxlen=depth) for s in self.systems}
+        self._wake = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def _refill(self, system):
+        ring = self._rings[system]
+        need = self.depth - len(ring)
+        if need > 0:
+            puzzles, cum = self._tables[system]
+            ring.extend(random.choices(puzzles, cum_weights=cum, k=need))
+
+    def fill(self):
+        """Fill every buffer now (used at startup)."""
+        for system in self.systems:
+            self._refill(system)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            for system in self.systems:
+                if len(self._rings[system]) < self.low_water:
+                    self._refill(system)
+
+    def _kick(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="puzzle-bank", daemon=True)
+                    self._thread.start()
+        self._wake.set()
+
+    def take(self, system):
+        """Next puzzle for one system. The returned dict is shared: don't modify it."""
+        ring = self._rings[system]
+        while True:
+            try:
+                puzzle = ring.popleft()
+                break
+            except IndexError:
+                self._refill(system)
+        if self.background and len(ring) < self.low_water:
+            self._kick()
+        return puzzle
+
+    def draw(self):
+        """Pick a system by weight, then hand out one of its puzzles."""
+        system = random.choices(self.systems, cum_weights=self.cum_weights)[0]
+        return self.take(system)
@@ -0,0 +1,152 @@
+"""
+Server-side rate limits, keyed by policy + client (+ whatever else the caller adds).
+
+Two policies, both O(1) per check with a fixed-size state per key:
+
+  TokenBucket(rate, burst)    `burst` hits at once, then `rate` per second
+  SlidingWindow(limit, window)  at most `limit` hits in any `window` seconds
+                                (sliding window counter: this window's count
+                                plus the previous one's, weighted by overlap)
+
+A key's state is dropped once it has idled long enough to be back to fresh
+(policy.ttl), so keys never outlive their usefulness:
+
+  in-process game:  one bounded store per policy (timing-wheel expiry + LRU,
+                    the same structure as the puzzle tokens), so memory
+                    stays bounded however many clients show up
+  shared game:      records in the STATE_BACKEND, updated atomically with
+                    update_record(), so every worker enforces the same limits
+
+hit() returns 0 when the hit is allowed, else the seconds to wait.
+"""
+import threading
+import time
+
+from puzzle_store import PuzzleStore
+from state_store import MemoryStore
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        # an idle bucket is full again after this long
+        self.ttl = burst / rate
+
+    def _tokens(self, state, now):
+        if state is None:
+            return self.burst
+        tokens, ts = state
+        return min(self.burst, tokens + (now - ts) * self.rate)
+
+    def hit(self, state, now):
+        """-> (new state, seconds to wait; 0 = allowed)"""
+        tokens = self._tokens(state, now)
+        if tokens >= 1:
+            return [tokens - 1, now], 0.0
+        return [tokens, now], (1 - tokens) / self.rate
+
+    def wait(self, state, now):
+        tokens = self._tokens(state, now)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+
+class SlidingWindow:
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self.ttl = 2 * window
+
+    def _counts(self, state, now):
+        idx = int(now // self.window)
+        if state is None:
+            return idx, 0, 0
+        old_idx, prev, cur = state
+        if idx == old_idx:
+            return idx, prev, cur
+        if idx == old_idx + 1:
+            return idx, cur, 0
+        return idx, 0, 0
+
+    def _wait(self, idx, prev, cur, now):
+        start = idx * self.window
+        weight = 1 - (now - start) / self.window
+        if prev * weight + cur + 1 <= self.limit:
+            return 0.0
+        if cur + 1 <= self.limit:
+            # wait for enough of the previous window to slide out
+            return start + self.window * (1 - (self.limit - cur - 1) / prev) - now
+        # full on its own: wait for the next window, then for this one to slide out
+        return start + self.window - now + self.window * max(0.0, 1 - (self.limit - 1) / cur)
+
+    def hit(self, state, now):
+        idx, prev, cur = self._counts(state, now)
+        wait = self._wait(idx, prev, cur, now)
+        if wait == 0:
+            cur += 1
+        return [idx, prev, cur], wait
+
+    def wait(self, state, now):
+        return self._wait(*self._counts(state, now), now)
+
+
+# ======= BACKENDS =======
+class LocalBuckets:
+    def __init__(self, policies, max_keys=1000000):
+        self._lock = threading.Lock()
+        self._stores = {
+            name: PuzzleStore(ttl=policy.ttl, max_size=max_keys, tick=max(1.0, policy.ttl / 512))
+            for name, policy in policies.items()
+        }
+
+    def update(self, name, key, fn, ttl):
+        store = self._stores[name]
+        with self._lock:
+            state, result = fn(store.get(key))
+            store[key] = state
+            return result
+
+    def get(self, name, key):
+        return self._stores[name].get(key)
+
+    def stats(self):
+        return {name: len(store) for name, store in self._stores.items()}
+
+
+class SharedBuckets:
+    def __init__(self, store):
+        self.store = store
+
+    def update(self, name, key, fn, ttl):
+        return self.store.update_record(f"rl:{name}:{key}", fn, ttl=ttl)
+
+    def get(self, name, key):
+        return self.store.get_record(f"rl:{name}:{key}")
+
+    def stats(self):
+        return {}
+
+
+class RateLimiter:
+    def __init__(self, policies, backend, clock=time.time):
+        self.policies = policies
+        self.backend = backend
+        # wall clock: shared backends compare timestamps written by other processes
+        self.clock = clock
+
+    def hit(self, name, key):
+        """Count one hit. Returns 0 if it is allowed, else the seconds until it would be."""
+        policy = self.policies[name]
+        now = self.clock()
+        return self.backend.update(name, key, lambda state: policy.hit(state, now), policy.ttl)
+
+    def wait(self, name, key):
+        """Seconds until a hit would be allowed, without counting one."""
+        return self.policies[name].wait(self.backend.get(name, key), self.clock())
+
+
+def make_limiter(store, policies, max_keys=1000000):
+    """In-process game -> bounded local buckets; shared game -> records next to STATE."""
+    if isinstance(store, MemoryStore):
+        return RateLimiter(policies, LocalBuckets(policies, max_keys))
+    return RateLimiter(policies, SharedBuckets(store))
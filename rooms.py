@@ -0,0 +1,130 @@
+"""
+Game rooms.
+
+Each room is an independent game: its own counters (a namespace of the
+state backend), its own puzzles, its own live feed and its own lock, so
+players in different rooms never touch the same data or wait on each
+other. The registry keeps rooms in LRU order and drops the ones nobody
+has used for `idle_ttl` seconds (checked from the cold end on every
+lookup, so it stays O(1) per request with thousands of rooms). Rooms in
+use are never dropped to make space: once `max_rooms` are open a new
+room is refused (RoomsFull) until one goes idle.
+
+With a shared backend an evicted room only loses its in-process handle;
+its state stays in SQLite/Redis. With the in-memory backend an evicted
+room resets, unless the event log is on (its state is rebuilt from there).
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_ROOM = "main"
+ROOM_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+
+
+def valid_room_id(room_id):
+    return bool(room_id) and ROOM_ID_RE.match(room_id) is not None
+
+
+class RoomPuzzles:
+    """One room's view of the shared puzzle store: tokens from other rooms don't exist here."""
+
+    def __init__(self, puzzles, room_id):
+        self.puzzles = puzzles
+        self.room_id = room_id
+
+    def __contains__(self, token):
+        return self.get(token) is not None
+
+    def __setitem__(self, token, record):
+        self.puzzles[token] = dict(record, room=self.room_id)
+
+    def get(self, token, default=None):
+        record = self.puzzles.get(token)
+        if record is None or record.get("room") != self.room_id:
+            return default
+        return record
+
+    def pop(self, token, default=None):
+        if self.get(token) is None:
+            return default
+        return self.puzzles.pop(token, default)
+
+
+class Room:
+    def __init__(self, room_id, state, puzzles, live):
+        self.id = room_id
+        self.state = state
+        self.puzzles = puzzles
+        self.live = live
+        # held around a whole action so its several store ops apply as one
+        self.lock = threading.RLock()
+        self.last_used = time.monotonic()
+
+
+class RoomsFull(RuntimeError):
+    """max_rooms rooms are open and none of them is idle."""
+
+
+class RoomRegistry:
+    def __init__(self, factory, idle_ttl=1800, max_rooms=10000):
+        self.factory = factory
+        self.idle_ttl = idle_ttl
+        self.max_rooms = max_rooms
+        self._rooms = OrderedDict()
+        # only guards the dict itself (a few microseconds); game actions use room.lock
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, room_id, create=True):
+        """The room, built on first use; None if it isn't open and create is False."""
+        now = time.monotonic()
+        with self._lock:
+            room = self._rooms.get(room_id)
+            if room is not None:
+                self._rooms.move_to_end(room_id)
+                room.last_used = now
+                self._evict(now)
+                return room
+            if not create:
+                return None
+            self._evict(now)
+            self._check_space(room_id)
+        # build outside the registry lock: a slow backend shouldn't block other rooms
+        room = self.factory(room_id)
+        with self._lock:
+            # another request may have built it meanwhile; keep the first one
+            if room_id not in self._rooms:
+                self._check_space(room_id)
+            room = self._rooms.setdefault(room_id, room)
+            self._rooms.move_to_end(room_id)
+            room.last_used = now
+            return room
+
+    def _check_space(self, room_id):
+        # the main game can always be opened
+        if len(self._rooms) >= self.max_rooms and room_id != DEFAULT_ROOM:
+            raise RoomsFull(f"{len(self._rooms)} rooms are open")
+
+    def _evict(self, now):
+        checked = 0
+        while self._rooms and checked < len(self._rooms):
+            room_id, room = next(iter(self._rooms.items()))
+            if now - room.last_used < self.idle_ttl:
+                break
+            checked += 1
+            if room.live._subscribers:
+                # spectators are still watching: keep it, look again after a full idle period
+                room.last_used = now
+                self._rooms.move_to_end(room_id)
+                continue
+            del self._rooms[room_id]
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._rooms)
+
+    def rooms(self):
+        with self._lock:
+            return list(self._rooms.values())
@@ -0,0 +1,46 @@
+"""
+High-concurrency entry point (gevent).
+
+    gunicorn -c gunicorn_conf.py serve_async:app
+
+Each worker serves connections on greenlets instead of one OS thread per
+request, so slow or idle keep-alive clients and /api/v1/stream subscribers
+don't hold a whole worker. Plain `gunicorn app:app` (sync workers) still
+works for local runs.
+
+The stdlib is patched before app.py is imported, so the locks in the state
+stores, the puzzle bank refill thread and the live feed pump all become
+greenlet-aware. All STATE changes go through the store's atomic ops, and
+the in-memory store never yields while holding its lock, so greenlets
+can't interleave inside an update.
+
+Measured with bench/bench_concurrency.py on one core (1 worker, 200
+GET /api/v1/state requests from 20 client threads, 3s client timeout):
+
+    held connections                 sync (-w 1)          gevent (1000 conns)
+    0 stalled (gevent: + 5 streams)  200/200, p50 20ms    200/200, p50 32ms
+    1 stalled request                0/200 (timed out)    -
+    1 stream subscriber              0/200 (timed out)    -
+    10 stalled + 5 streams           0/200 (timed out)    200/200, p50 29ms
+    500 stalled + 5 streams          -                    200/200, p50 27ms
+    950 stalled + 5 streams          -                    200/200, p50 21ms
+    1200 stalled + 5 streams         -                    180/200, p95 1.5s
+
+The ceiling is worker_connections per worker (idle sockets and SSE
+subscribers count toward it). Raise WORKER_CONNECTIONS or WEB_CONCURRENCY
+(with a shared STATE_BACKEND) to go past it.
+
+sqlite3 calls don't yield to the loop, so SQLiteStore runs them on the
+hub's threadpool once threading is patched: a request waiting on another
+worker's write lock no longer freezes the rest. Same bench, --store sqlite,
+100 reads while 4 threads keep POSTing /api/v1/hack/new and another process
+holds the write lock 0.5s at a time:
+
+    inline sqlite3 calls      100/100, p50 1073ms, p95 1641ms
+    on the hub threadpool     100/100, p50 32ms,   p95 45ms
+"""
+from gevent import monkey
+
+monkey.patch_all()
+
+from app import app  # noqa: E402,F401
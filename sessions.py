@@ -0,0 +1,158 @@
+"""
+Server-side sessions.
+
+Flask's default session is the whole dict, serialized and HMAC-signed into
+the cookie, re-sent on every response that touches it and verified on
+every request. Here the cookie only carries an opaque random id; the data
+lives server-side:
+
+  - in-process game:  a bounded local store (LRU + timing-wheel expiry,
+                      the same structure as the puzzle tokens)
+  - shared game:      records in the STATE_BACKEND (SQLite / Redis), so
+                      every worker sees the same sessions
+
+The data is loaded the first time the request actually reads the session,
+and written back at the end only if it differs from what was loaded. The
+cookie itself is only sent when a new session is created or one is dropped.
+
+SESSION_BACKEND=cookie switches back to Flask's signed-cookie sessions.
+"""
+import copy
+import re
+import secrets
+
+from flask.sessions import SecureCookieSessionInterface, SessionInterface, SessionMixin
+
+from puzzle_store import PuzzleStore
+from state_store import MemoryStore, RecordMap
+
+SID_RE = re.compile(r"^[A-Za-z0-9_-]{32}$")
+
+
+def new_sid():
+    return secrets.token_urlsafe(24)
+
+
+class ServerSession(SessionMixin):
+    def __init__(self, sid, store):
+        self.sid = sid
+        self.store = store
+        self.new = sid is None
+        self.accessed = False
+        self._data = None
+        self._loaded = None
+        self._dropped = None
+
+    def _load(self):
+        self.accessed = True
+        if self._data is None:
+            record = self.store.get(self.sid) if self.sid else None
+            if record is None:
+                # unknown or expired id: never adopt an id the client picked, issue a fresh one
+                self.sid = None
+            self._loaded = record or {}
+            # deep: flash() appends to a list in place, which must still count as a change
+            self._data = copy.deepcopy(self._loaded)
+        return self._data
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+
+    def __delitem__(self, key):
+        del self._load()[key]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def regenerate(self):
+        """Move the data to a new id (call on privilege changes); the old id is dropped on save."""
+        self._load()
+        if self.sid:
+            self._dropped = self.sid
+            self.sid = None
+        # saved under the new id even if nothing else changes
+        self._loaded = {}
+
+    @property
+    def modified(self):
+        return self._data is not None and self._data != self._loaded
+
+
+class ServerSessionInterface(SessionInterface):
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid is not None and not SID_RE.match(sid):
+            sid = None
+        return ServerSession(sid, self.store)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add("Cookie")
+        if session._dropped:
+            self.store.pop(session._dropped, None)
+        if not session.modified:
+            return
+
+        if not session:
+            # emptied: forget it on both ends
+            if session.sid:
+                self.store.pop(session.sid, None)
+            if session.sid or session._dropped:
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        sid = session.sid or new_sid()
+        # stored as a copy, so later edits to the session object don't leak in unsaved
+        self.store[sid] = copy.deepcopy(session._data)
+        if sid != session.sid:
+            response.set_cookie(
+                name, sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+def regenerate(session):
+    """New session id for the same data. Signed-cookie sessions carry no id, so there is nothing to do."""
+    if isinstance(session, ServerSession):
+        session.regenerate()
+
+
+class SharedSessions(RecordMap):
+    """Sessions next to the shared game state; the backend expires them."""
+
+    def __init__(self, store, ttl):
+        super().__init__(store, "session:")
+        self.ttl = ttl
+
+    def __setitem__(self, sid, record):
+        self.store.put_record(self.prefix + sid, record, ttl=self.ttl)
+
+    def stats(self):
+        return {"size": self.store.count_records(self.prefix)}
+
+
+def make_session_interface(store, backend="server", ttl=86400, max_size=100000):
+    """backend "cookie" -> Flask's signed cookies; otherwise server-side, local or shared like the puzzles."""
+    if backend == "cookie":
+        return SecureCookieSessionInterface()
+    if isinstance(store, MemoryStore):
+        # a coarse tick keeps the wheel small for a day-long TTL
+        return ServerSessionInterface(PuzzleStore(ttl=ttl, max_size=max_size, tick=60.0))
+    return ServerSessionInterface(SharedSessions(store, ttl))
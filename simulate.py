@@ -0,0 +1,341 @@
+"""
+Headless game simulator for balancing the economy.
+
+Plays many hacker-vs-defender games at once: every game is one slot in a
+set of NumPy arrays and each step applies the /hack, /black-market and
+/login transitions to all of them with array ops. The rules come from the
+game itself: puzzles are drawn from puzzles.TABLES with the bank's system
+weights, intel uses app.FILE_POOL the way hacker_success() does, and the
+economy constants default to the ones in app.py.
+
+A game is one session: minutes * 60 / (think + cooldown) hacks. Each step
+the hacker may buy a Cool Down, then answers (right with chance `skill`)
+or cancels, then sells all intel once holding `sell_at` GB; the defender
+cancels a full detection with chance `defender` and uses an available
+Increase Defense with chance `boost`.
+
+    python simulate.py --games 1000000
+    python simulate.py --grid mult=0.25,0.5,0.75 --grid cooldown=5,10,20 --games 200000
+    python simulate.py --check 20      # same seeds through the real Flask routes
+
+Parameter sets (and big runs, in chunks) are spread over a process pool.
+Needs numpy: pip install -r requirements-sim.txt
+"""
+import argparse
+import json
+import os
+import secrets
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import permutations, product
+
+import numpy as np
+
+# the game's cooldown is a simulation parameter; the --check run plays the routes back to back
+GAME_COOLDOWN = int(os.environ.get("COOLDOWN_SECONDS", "10"))
+os.environ["COOLDOWN_SECONDS"] = "0"
+os.environ["RATE_LIMIT"] = "off"
+
+import app as game  # noqa: E402
+from puzzles import SYSTEMS, TABLES  # noqa: E402
+
+DEFAULTS = {
+    # economy: the game's current values
+    "mult": game.DEFENSE_REDUCTION_MULTIPLIER,
+    "gb_per_credit": game.GB_PER_CREDIT,
+    "cooldown": GAME_COOLDOWN,
+    "traced_penalty": game.TRACED_PENALTY_GB,
+    "cancel_penalty": game.CANCEL_DETECTION_PENALTY_GB,
+    "boost_hacks": game.BOOST_HACKS,
+    "cooldown_cost": game.COOLDOWN_COST,
+    "max_detection": game.DEFAULT_STATE["max_detection"],
+    # players
+    "minutes": 60,     # session length
+    "think": 15,       # seconds to read and answer one puzzle
+    "skill": 0.8,      # chance an answer is right
+    "cancel": 0.05,    # chance to cancel instead of answering
+    "sell_at": 30,     # sell all intel once holding this many GB
+    "cool_at": 4,      # buy a Cool Down at this detection when affordable (0 = never)
+    "defender": 0.5,   # chance per step the defender cancels a full detection
+    "boost": 0.8,      # chance per step the defender uses an available Increase Defense
+}
+METRICS = ("intel", "credits", "cycles", "traced")
+CHUNK = 100000
+
+# random.sample(FILE_POOL, k=2): every ordered pair of two different files is equally likely
+PAIRS = list(permutations(range(len(game.FILE_POOL)), 2))
+PAIR_SIZE = np.array([game.FILE_POOL[a][1] + game.FILE_POOL[b][1] for a, b in PAIRS], dtype=np.int64)
+# hacker_success() rolls 10..40 GB for an all-empty pair; no such pair exists in FILE_POOL
+assert PAIR_SIZE.min() > 0
+
+# the bank's system odds, and each system's puzzle odds (as in PuzzleBank)
+SYSTEM_IDS = [SYSTEMS.index(s) for s in game.PUZZLE_BANK.systems]
+SYSTEM_CUM = np.array(game.PUZZLE_BANK.cum_weights) / game.PUZZLE_BANK.cum_weights[-1]
+PUZZLE_CUM = {s: np.cumsum([w for _, w in TABLES[s]]) / sum(w for _, w in TABLES[s]) for s in SYSTEMS}
+
+
+def hacks_per_game(p):
+    return int(p["minutes"] * 60 // (p["think"] + p["cooldown"]))
+
+
+def draw(rng, n):
+    """One step of dice for n games. The order is fixed so --check can replay it."""
+    return {
+        "system": np.asarray(SYSTEM_IDS)[np.searchsorted(SYSTEM_CUM, rng.random(n), side="right")],
+        "puzzle": rng.random(n),
+        "cancel": rng.random(n),
+        "answer": rng.random(n),
+        "pair": rng.integers(0, len(PAIRS), n),
+        "defender": rng.random(n),
+        "boost": rng.random(n),
+    }
+
+
+# ======= ENGINE =======
+def play(p, n, rng, record=None):
+    """Play n games. Returns per-game arrays (METRICS plus the final counters)."""
+    z = lambda: np.zeros(n, dtype=np.int64)  # noqa: E731
+    det, files, credits, boost_avail, boost_left = z(), z(), z(), z(), z()
+    intel, earned, cycles, traced = z(), z(), z(), z()
+    logs = np.zeros((len(SYSTEMS), 2, n), dtype=np.int64)
+    mx = p["max_detection"]
+
+    for _ in range(hacks_per_game(p)):
+        d = draw(rng, n)
+        if record is not None:
+            record.append(d)
+
+        # hack_cooldown: pay to take one detection off
+        if p["cool_at"]:
+            cool = (det >= p["cool_at"]) & (credits >= p["cooldown_cost"])
+            credits -= cool * p["cooldown_cost"]
+            det = np.where(cool, np.maximum(det - 1, 0), det)
+
+        # hack_cancel / hack_submit
+        cancel = d["cancel"] < p["cancel"]
+        right = ~cancel & (d["answer"] < p["skill"])
+        wrong = ~cancel & ~right
+        old = det
+        det = np.where(cancel | wrong, np.minimum(det + 1, mx), det)
+        # cancel is traced when detection was already full, a wrong answer when it becomes full
+        hit = (cancel & (old >= mx)) | (wrong & (det >= mx))
+        files = np.where(hit, np.maximum(files - p["traced_penalty"], 0), files)
+        traced += hit
+
+        # hacker_success(): two files, halved (or so) while a defense boost runs
+        size = PAIR_SIZE[d["pair"]]
+        size = np.where(boost_left > 0, np.maximum(1, np.round(size * p["mult"])).astype(np.int64), size)
+        gain = np.where(right, size, 0)
+        files += gain
+        intel += gain
+        for k in range(len(SYSTEMS)):
+            mine = d["system"] == k
+            logs[k, 0] += right & mine
+            logs[k, 1] += wrong & mine
+        # count_down_boost() runs on every submit and cancel
+        boost_left = np.maximum(boost_left - 1, 0)
+
+        # sell_intel(): whole groups only
+        sold = np.where(files >= p["sell_at"], files // p["gb_per_credit"], 0)
+        files -= sold * p["gb_per_credit"]
+        credits += sold
+        earned += sold
+
+        # defender_cancel_detection, then defender_download
+        reset = (det >= mx) & (d["defender"] < p["defender"])
+        files = np.where(reset, np.maximum(files - p["cancel_penalty"], 0), files)
+        det = np.where(reset, 0, det)
+        boost_avail = np.where(reset, 1, boost_avail)
+        cycles += reset
+        use = (boost_avail == 1) & (d["boost"] < p["boost"])
+        boost_avail = np.where(use, 0, boost_avail)
+        boost_left = np.where(use, p["boost_hacks"], boost_left)
+
+    return {
+        "intel": intel, "credits": earned, "cycles": cycles, "traced": traced,
+        "files": files, "credits_left": credits, "detection": det,
+        "boost_available": boost_avail, "boost_left": boost_left, "logs": logs,
+    }
+
+
+def run_chunk(p, n, seed):
+    out = play(p, n, np.random.default_rng(seed))
+    return {m: out[m].astype(np.int32) for m in METRICS}
+
+
+def summarize(values):
+    pct = np.percentile(values, [5, 25, 50, 75, 95])
+    return {"mean": round(float(values.mean()), 2), **{f"p{q}": float(v) for q, v in zip((5, 25, 50, 75, 95), pct)}}
+
+
+def sweep(param_sets, games, seed=1, workers=None):
+    """Run every parameter set on a process pool. Returns [(params, {metric: summary})]."""
+    seeds = np.random.SeedSequence(seed)
+    jobs = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for p in param_sets:
+            sizes = [min(CHUNK, games - i) for i in range(0, games, CHUNK)]
+            jobs.append([pool.submit(run_chunk, p, n, s) for n, s in zip(sizes, seeds.spawn(len(sizes)))])
+        results = []
+        for p, futures in zip(param_sets, jobs):
+            parts = [f.result() for f in futures]
+            results.append((p, {m: summarize(np.concatenate([part[m] for part in parts])) for m in METRICS}))
+    return results
+
+
+# ======= CHECK AGAINST THE FLASK PATH =======
+ECONOMY = {
+    "mult": "DEFENSE_REDUCTION_MULTIPLIER", "gb_per_credit": "GB_PER_CREDIT",
+    "traced_penalty": "TRACED_PENALTY_GB", "cancel_penalty": "CANCEL_DETECTION_PENALTY_GB",
+    "boost_hacks": "BOOST_HACKS", "cooldown_cost": "COOLDOWN_COST",
+}
+
+
+@contextmanager
+def game_rules(p):
+    """Point app.py's economy constants at p for the duration."""
+    saved = {name: getattr(game, name) for name in ECONOMY.values()}
+    saved_max = game.DEFAULT_STATE["max_detection"]
+    try:
+        for key, name in ECONOMY.items():
+            setattr(game, name, p[key])
+        game.DEFAULT_STATE["max_detection"] = p["max_detection"]
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(game, name, value)
+        game.DEFAULT_STATE["max_detection"] = saved_max
+
+
+@contextmanager
+def dice(puzzle=None, pair=None):
+    """Make the app draw this puzzle / these two files instead of random ones."""
+    bank, rnd = game.PUZZLE_BANK, game.random
+    real_sample = rnd.sample
+    if puzzle is not None:
+        bank.draw = lambda: puzzle
+    if pair is not None:
+        rnd.sample = lambda pool, k: [pool[pair[0]], pool[pair[1]]]
+    try:
+        yield
+    finally:
+        bank.__dict__.pop("draw", None)
+        rnd.sample = real_sample
+
+
+def flask_game(p, record):
+    """Replay one game's dice through the real routes; return what the app ended up with."""
+    client = game.app.test_client()
+    client.get(f"/?room=sim-{secrets.token_hex(6)}")
+    client.post("/login", data={"action": "choose", "defense": "keypad", "def_pass": game.PASS_KEYPAD})
+    state = lambda: client.get("/api/v1/state").get_json()["state"]  # noqa: E731
+    cycles = 0
+
+    for d in record:
+        s = state()
+        if p["cool_at"] and s["detection"] >= p["cool_at"] and s["credits"] >= p["cooldown_cost"]:
+            client.post("/hack", data={"action": "cooldown"})
+
+        system = SYSTEMS[d["system"][0]]
+        puzzle = TABLES[system][int(np.searchsorted(PUZZLE_CUM[system], d["puzzle"][0], side="right"))][0]
+        with dice(puzzle=puzzle):
+            client.post("/hack", data={"action": "new"})
+        if d["cancel"][0] < p["cancel"]:
+            client.post("/hack", data={"action": "cancel"})
+        else:
+            answer = puzzle["expected"] if d["answer"][0] < p["skill"] else "wrong"
+            with dice(pair=PAIRS[d["pair"][0]]):
+                client.post("/hack", data={"action": "submit", "answer": answer})
+
+        s = state()
+        if s["files"] >= p["sell_at"]:
+            client.post("/black-market", data={"gb": str(s["files"])})
+        if s["detection"] >= p["max_detection"] and d["defender"][0] < p["defender"]:
+            client.post("/login", data={"action": "cancel_detection"})
+            cycles += 1
+        if state()["defense_boost_available"] == 1 and d["boost"][0] < p["boost"]:
+            client.post("/login", data={"action": "download"})
+
+    full = client.get("/api/v1/state").get_json()
+    me = client.get("/api/v1/leaderboard").get_json()["you"]["stats"] or {"intel": 0, "credits": 0, "systems": {}}
+    s = full["state"]
+    return {
+        "intel": me["intel"], "credits": me["credits"], "cycles": cycles,
+        "files": s["files"], "credits_left": s["credits"], "detection": s["detection"],
+        "boost_available": s["defense_boost_available"], "boost_left": s["defense_boost_hacks_left"],
+        "logs": {k: [v["success"], v["fail"]] for k, v in full["logs"].items()},
+    }
+
+
+def check(p, seeds):
+    """Play each seed in the engine and through Flask; report any seed where they differ."""
+    bad = 0
+    with game_rules(p):
+        for seed in seeds:
+            record = []
+            sim = play(p, 1, np.random.default_rng(seed), record)
+            want = {k: int(v[0]) for k, v in sim.items() if k not in ("logs", "traced")}
+            want["logs"] = {s: [int(sim["logs"][i, 0, 0]), int(sim["logs"][i, 1, 0])] for i, s in enumerate(SYSTEMS)}
+            got = flask_game(p, record)
+            diff = {k: (want[k], got[k]) for k in want if want[k] != got[k]}
+            if diff:
+                bad += 1
+                print(f"seed {seed}: MISMATCH {diff}")
+            else:
+                print(f"seed {seed}: ok  intel={want['intel']} credits={want['credits']} cycles={want['cycles']}")
+    return bad
+
+
+# ======= CLI =======
+def parse_grid(items):
+    grid = {}
+    for item in items:
+        key, _, values = item.partition("=")
+        if key not in DEFAULTS:
+            raise SystemExit(f"unknown parameter {key!r}; known: {', '.join(DEFAULTS)}")
+        kind = type(DEFAULTS[key])
+        grid[key] = [kind(v) for v in values.split(",")]
+    return [dict(DEFAULTS, **dict(zip(grid, combo))) for combo in product(*grid.values())], list(grid)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--grid", action="append", default=[], metavar="PARAM=V1,V2",
+                    help="sweep a parameter (repeat for a full grid); see DEFAULTS")
+    ap.add_argument("--games", type=int, default=100000, help="games per parameter set")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--workers", type=int, help="processes (default: all cores)")
+    ap.add_argument("--out", help="write the summaries as JSON")
+    ap.add_argument("--check", type=int, metavar="SEEDS", help="compare N seeds against the Flask routes")
+    args = ap.parse_args()
+
+    param_sets, swept = parse_grid(args.grid)
+    if args.check:
+        failed = sum(check(p, range(args.seed, args.seed + args.check)) for p in param_sets)
+        sys.exit(1 if failed else 0)
+
+    t0 = time.perf_counter()
+    results = sweep(param_sets, args.games, args.seed, args.workers)
+    elapsed = time.perf_counter() - t0
+    total = args.games * len(param_sets)
+    print(f"{total:,} games in {elapsed:.1f}s ({total / elapsed:,.0f} games/s, "
+          f"{hacks_per_game(param_sets[0])} hacks each for the first set)")
+    for p, summary in results:
+        label = " ".join(f"{k}={p[k]}" for k in swept) or "defaults"
+        print(f"\n[{label}]")
+        for m in METRICS:
+            s = summary[m]
+            print(f"  {m:<8} mean {s['mean']:>9}  p5 {s['p5']:>7g}  p25 {s['p25']:>7g}  "
+                  f"p50 {s['p50']:>7g}  p75 {s['p75']:>7g}  p95 {s['p95']:>7g}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump([{"params": p, "summary": s} for p, s in results], f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
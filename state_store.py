@@ -0,0 +1,696 @@
+"""
+Game state backends.
+
+Every store keeps two kinds of data:
+  * integer counters (detection, files, credits, boost counters, defense logs)
+  * small JSON records (puzzle tokens, sessions, rate-limit buckets)
+
+All counter updates go through incr() / compare_and_set() so two workers
+can never lose each other's writes. Pick a backend with STATE_BACKEND:
+
+  memory                      one process (default, same as the old dicts)
+  sqlite:///path/to/game.db   several workers on one host (WAL mode)
+  redis://host:6379/0         anything that speaks the Redis protocol
+"""
+import copy
+import itertools
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+from sortedcontainers import SortedList
+
+
+# MemoryStore versions come from one process-wide sequence, so a store built
+# later (a room evicted and rebuilt) never repeats a version an older one used
+_VERSIONS = itertools.count(1)
+
+# SQLite connections opened before a fork (gunicorn --preload): parked here in the
+# child, never used or closed there, since closing one can checkpoint the parent's WAL
+_INHERITED = []
+
+
+def _blocking(fn, *args):
+    """Call fn(*args); under gevent, on the hub's threadpool.
+
+    sqlite3 calls never yield to the gevent loop, so one connection waiting on
+    another worker's write lock (up to the 10 s busy timeout) would stall every
+    greenlet in the process. On a native thread only that one request waits.
+    """
+    monkey = sys.modules.get("gevent.monkey")
+    if monkey is None or not monkey.is_module_patched("threading"):
+        return fn(*args)
+    import gevent
+    # looked up per call: gunicorn forks after import and each worker has its own hub
+    return gevent.get_hub().threadpool.apply(fn, args)
+
+
+def _clamp(value, lo, hi):
+    if lo is not None and value < lo:
+        value = lo
+    if hi is not None and value > hi:
+        value = hi
+    return value
+
+
+class StateStore:
+    """Small interface every backend implements."""
+
+    def seed(self, defaults):
+        """Set any counters that don't exist yet (existing values are kept)."""
+        raise NotImplementedError
+
+    def get(self, key, default=0):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def incr(self, key, delta=1, lo=None, hi=None):
+        """Atomically add delta, clamped to [lo, hi]. Returns (old, new)."""
+        raise NotImplementedError
+
+    def compare_and_set(self, key, expected, new):
+        """Set key to new only if it currently equals expected."""
+        raise NotImplementedError
+
+    def snapshot(self):
+        """All counters as a plain dict."""
+        raise NotImplementedError
+
+    def version(self):
+        """
+        A value that changes whenever any counter does (page caches key on it).
+        Shared backends derive it from one snapshot read; MemoryStore counts writes
+        (on a process-wide sequence, unique across store instances).
+        """
+        return hash(tuple(sorted(self.snapshot().items())))
+
+    def put_record(self, key, record, ttl=None):
+        """Store a JSON-able dict; with ttl (seconds) it disappears on its own."""
+        raise NotImplementedError
+
+    def get_record(self, key):
+        raise NotImplementedError
+
+    def pop_record(self, key):
+        raise NotImplementedError
+
+    def count_records(self, prefix):
+        raise NotImplementedError
+
+    # ---- rankings: members ordered by score (highest first), ties by member ----
+    def rank_add(self, board, member, score):
+        """Raise member's score to `score` (added if new). Never lowers it, so concurrent writers can't."""
+        raise NotImplementedError
+
+    def rank_top(self, board, k):
+        """The first k members."""
+        raise NotImplementedError
+
+    def rank_of(self, board, member):
+        """0-based position of member, or None."""
+        raise NotImplementedError
+
+    def rank_count(self, board):
+        raise NotImplementedError
+
+    def rank_trim(self, board, size):
+        """Drop the last members until at most `size` are left. Returns the dropped ones."""
+        raise NotImplementedError
+
+    def update_record(self, key, fn, ttl=None):
+        """
+        Atomic read-modify-write of one record: fn(record or None) -> (new_record, result).
+        new_record is stored (with ttl) and result returned. Used by the rate limiter.
+        """
+        raise NotImplementedError
+
+    def namespace(self, ns):
+        """A store for one game room: same backend, its own keys."""
+        raise NotImplementedError
+
+    # ---- helpers built on the primitives ----
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def spend(self, key, amount):
+        """Take amount off key only if there is enough. Returns True on success."""
+        while True:
+            current = self.get(key)
+            if current < amount:
+                return False
+            if self.compare_and_set(key, current, current - amount):
+                return True
+
+
+# ======= IN-PROCESS =======
+class MemoryStore(StateStore):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._records = {}
+        self._ranks = {}
+        self._version = next(_VERSIONS)
+        # listener(key, new_value) runs inside the lock, so it sees changes in
+        # the order they were applied (events.EventLog relies on that)
+        self.listener = None
+
+    def load(self, values):
+        """Bulk-set counters without telling the listener (restoring saved state)."""
+        with self._lock:
+            self._counters.update(values)
+            self._version = next(_VERSIONS)
+
+    def _changed(self, key, value):
+        self._version = next(_VERSIONS)
+        if self.listener is not None:
+            self.listener(key, value)
+
+    def seed(self, defaults):
+        with self._lock:
+            for key, value in defaults.items():
+                self._counters.setdefault(key, value)
+            self._version = next(_VERSIONS)
+
+    def get(self, key, default=0):
+        return self._counters.get(key, default)
+
+    def set(self, key, value):
+        with self._lock:
+            self._counters[key] = value
+            self._changed(key, value)
+
+    def incr(self, key, delta=1, lo=None, hi=None):
+        with self._lock:
+            old = self._counters.get(key, 0)
+            new = _clamp(old + delta, lo, hi)
+            self._counters[key] = new
+            if new != old:
+                self._changed(key, new)
+            return old, new
+
+    def compare_and_set(self, key, expected, new):
+        with self._lock:
+            if self._counters.get(key, 0) != expected:
+                return False
+            self._counters[key] = new
+            self._changed(key, new)
+            return True
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def version(self):
+        return self._version
+
+    def put_record(self, key, record, ttl=None):
+        self._records[key] = (record, time.time() + ttl if ttl else None)
+
+    def get_record(self, key):
+        entry = self._records.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.time():
+            self._records.pop(key, None)
+            return None
+        return entry[0]
+
+    def pop_record(self, key):
+        record = self.get_record(key)
+        self._records.pop(key, None)
+        return record
+
+    def count_records(self, prefix):
+        return sum(1 for k in list(self._records) if k.startswith(prefix))
+
+    def _board(self, board):
+        # (SortedList of (-score, member), member -> score)
+        if board not in self._ranks:
+            self._ranks[board] = (SortedList(), {})
+        return self._ranks[board]
+
+    def rank_add(self, board, member, score):
+        with self._lock:
+            order, scores = self._board(board)
+            old = scores.get(member)
+            if old is not None:
+                if old >= score:
+                    return
+                order.remove((-old, member))
+            scores[member] = score
+            order.add((-score, member))
+
+    def rank_top(self, board, k):
+        with self._lock:
+            return [member for _, member in self._board(board)[0].islice(0, k)]
+
+    def rank_of(self, board, member):
+        with self._lock:
+            order, scores = self._board(board)
+            score = scores.get(member)
+            return None if score is None else order.index((-score, member))
+
+    def rank_count(self, board):
+        with self._lock:
+            return len(self._board(board)[1])
+
+    def rank_trim(self, board, size):
+        with self._lock:
+            order, scores = self._board(board)
+            dropped = []
+            while len(order) > size:
+                _, member = order.pop()
+                del scores[member]
+                dropped.append(member)
+            return dropped
+
+    def update_record(self, key, fn, ttl=None):
+        with self._lock:
+            record, result = fn(self.get_record(key))
+            self._records[key] = (record, time.time() + ttl if ttl else None)
+            return result
+
+    def namespace(self, ns):
+        # nothing is shared in-process, so a room is simply its own store
+        return MemoryStore()
+
+
+# ======= SQLITE (one host, many workers) =======
+class SQLiteStore(StateStore):
+    # expired records are deleted in one indexed sweep every N puts
+    SWEEP_EVERY = 64
+
+    def __init__(self, path):
+        self.path = path
+        # key prefix for rooms ("" = the main game, so old databases keep working)
+        self.ns = ""
+        # connections are checked out per call, not kept per thread: under gevent
+        # "per thread" means per greenlet, i.e. a new connection for every request
+        self._pool = queue.LifoQueue()
+        self._puts = 0
+        os.register_at_fork(after_in_child=self._after_fork)
+
+        def init(db):
+            db.execute("CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            db.execute("CREATE TABLE IF NOT EXISTS records (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+            cols = [row[1] for row in db.execute("PRAGMA table_info(records)")]
+            if "expires_at" not in cols:
+                db.execute("ALTER TABLE records ADD COLUMN expires_at REAL")
+            db.execute("CREATE INDEX IF NOT EXISTS records_expires ON records (expires_at)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS ranks "
+                "(board TEXT NOT NULL, member TEXT NOT NULL, score REAL NOT NULL, PRIMARY KEY (board, member))"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS ranks_order ON ranks (board, score DESC, member)")
+        self._read(init)
+
+    def _after_fork(self):
+        # drained in place: namespace views share this pool
+        while True:
+            try:
+                _INHERITED.append(self._pool.get_nowait())
+            except queue.Empty:
+                return
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _read(self, fn):
+        """Run fn(db) on a pooled connection (autocommit)."""
+        try:
+            db = self._pool.get_nowait()
+        except queue.Empty:
+            db = _blocking(self._connect)
+        try:
+            return _blocking(fn, db)
+        finally:
+            self._pool.put(db)
+
+    def _write(self, fn):
+        """Run fn(db) inside BEGIN IMMEDIATE so read-modify-write is atomic across processes."""
+        def go(db):
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                out = fn(db)
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+            return out
+        return self._read(go)
+
+    def _one(self, sql, args=()):
+        return self._read(lambda db: db.execute(sql, args).fetchone())
+
+    def namespace(self, ns):
+        view = copy.copy(self)  # shares the connection pool
+        view.ns = f"{ns}/"
+        return view
+
+    def seed(self, defaults):
+        def go(db):
+            db.executemany(
+                "INSERT OR IGNORE INTO counters (key, value) VALUES (?, ?)",
+                [(self.ns + k, v) for k, v in defaults.items()],
+            )
+        self._write(go)
+
+    def get(self, key, default=0):
+        key = self.ns + key
+        row = self._one("SELECT value FROM counters WHERE key = ?", (key,))
+        return row[0] if row else default
+
+    def set(self, key, value):
+        key = self.ns + key
+        self._one(
+            "INSERT INTO counters (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def incr(self, key, delta=1, lo=None, hi=None):
+        key = self.ns + key
+
+        def go(db):
+            row = db.execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()
+            old = row[0] if row else 0
+            new = _clamp(old + delta, lo, hi)
+            db.execute(
+                "INSERT INTO counters (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, new),
+            )
+            return old, new
+        return self._write(go)
+
+    def compare_and_set(self, key, expected, new):
+        key = self.ns + key
+
+        def go(db):
+            row = db.execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()
+            if (row[0] if row else 0) != expected:
+                return False
+            db.execute(
+                "INSERT INTO counters (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, new),
+            )
+            return True
+        return self._write(go)
+
+    def snapshot(self):
+        if self.ns:
+            rows = self._read(lambda db: db.execute(
+                "SELECT key, value FROM counters WHERE key >= ? AND key < ?",
+                (self.ns, self.ns + "\uffff"),
+            ).fetchall())
+            return {k[len(self.ns):]: v for k, v in rows}
+        # main game: every key without a room prefix
+        rows = self._read(lambda db: db.execute("SELECT key, value FROM counters WHERE instr(key, '/') = 0").fetchall())
+        return dict(rows)
+
+    def put_record(self, key, record, ttl=None):
+        key = self.ns + key
+        now = time.time()
+        self._puts += 1
+        sweep = self._puts % self.SWEEP_EVERY == 0
+
+        def go(db):
+            db.execute(
+                "INSERT INTO records (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                (key, json.dumps(record), now + ttl if ttl else None),
+            )
+            if sweep:
+                db.execute("DELETE FROM records WHERE expires_at <= ?", (now,))
+        self._read(go)
+
+    def get_record(self, key):
+        key = self.ns + key
+        row = self._one(
+            "SELECT value FROM records WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        )
+        return json.loads(row[0]) if row else None
+
+    def pop_record(self, key):
+        key = self.ns + key
+
+        def go(db):
+            row = db.execute(
+                "SELECT value FROM records WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+            db.execute("DELETE FROM records WHERE key = ?", (key,))
+            return json.loads(row[0]) if row else None
+        return self._write(go)
+
+    def count_records(self, prefix):
+        prefix = self.ns + prefix
+        row = self._one(
+            "SELECT COUNT(*) FROM records WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)",
+            (prefix, prefix + "\uffff", time.time()),
+        )
+        return row[0]
+
+    def rank_add(self, board, member, score):
+        self._read(lambda db: db.execute(
+            "INSERT INTO ranks (board, member, score) VALUES (?, ?, ?) "
+            "ON CONFLICT(board, member) DO UPDATE SET score = max(score, excluded.score)",
+            (self.ns + board, member, score),
+        ))
+
+    def rank_top(self, board, k):
+        rows = self._read(lambda db: db.execute(
+            "SELECT member FROM ranks WHERE board = ? ORDER BY score DESC, member LIMIT ?",
+            (self.ns + board, k),
+        ).fetchall())
+        return [row[0] for row in rows]
+
+    def rank_of(self, board, member):
+        board = self.ns + board
+
+        def go(db):
+            row = db.execute("SELECT score FROM ranks WHERE board = ? AND member = ?", (board, member)).fetchone()
+            if row is None:
+                return None
+            # counts the index entries ahead of it (two range scans, an OR would scan the board):
+            # microseconds near the top, a few ms at rank 100k
+            ahead = db.execute("SELECT COUNT(*) FROM ranks WHERE board = ? AND score > ?", (board, row[0])).fetchone()[0]
+            tied = db.execute(
+                "SELECT COUNT(*) FROM ranks WHERE board = ? AND score = ? AND member < ?", (board, row[0], member),
+            ).fetchone()[0]
+            return ahead + tied
+        return self._read(go)
+
+    def rank_count(self, board):
+        return self._one("SELECT COUNT(*) FROM ranks WHERE board = ?", (self.ns + board,))[0]
+
+    def rank_trim(self, board, size):
+        board = self.ns + board
+
+        def go(db):
+            over = db.execute("SELECT COUNT(*) FROM ranks WHERE board = ?", (board,)).fetchone()[0] - size
+            if over <= 0:
+                return []
+            dropped = [row[0] for row in db.execute(
+                "SELECT member FROM ranks WHERE board = ? ORDER BY score, member DESC LIMIT ?", (board, over),
+            )]
+            db.executemany("DELETE FROM ranks WHERE board = ? AND member = ?", [(board, m) for m in dropped])
+            return dropped
+        return self._write(go)
+
+    def update_record(self, key, fn, ttl=None):
+        key = self.ns + key
+        now = time.time()
+        self._puts += 1
+        sweep = self._puts % self.SWEEP_EVERY == 0
+
+        def go(db):
+            row = db.execute(
+                "SELECT value FROM records WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, now),
+            ).fetchone()
+            record, result = fn(json.loads(row[0]) if row else None)
+            db.execute(
+                "INSERT INTO records (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                (key, json.dumps(record), now + ttl if ttl else None),
+            )
+            if sweep:
+                db.execute("DELETE FROM records WHERE expires_at <= ?", (now,))
+            return result
+        return self._write(go)
+
+
+# ======= REDIS PROTOCOL (many hosts) =======
+class RedisStore(StateStore):
+    """Counters live in one hash, records in their own string keys."""
+
+    def __init__(self, url, prefix="hackersweb"):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("STATE_BACKEND=redis:// needs the 'redis' package (pip install redis)") from exc
+        self._redis = redis
+        self.r = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.hash = f"{prefix}:state"
+
+    def _rec(self, key):
+        return f"{self.prefix}:rec:{key}"
+
+    def namespace(self, ns):
+        view = copy.copy(self)  # shares the client and its connection pool
+        view.prefix = f"{self.prefix}:{ns}"
+        view.hash = f"{view.prefix}:state"
+        return view
+
+    def seed(self, defaults):
+        pipe = self.r.pipeline()
+        for key, value in defaults.items():
+            pipe.hsetnx(self.hash, key, value)
+        pipe.execute()
+
+    def get(self, key, default=0):
+        value = self.r.hget(self.hash, key)
+        return int(value) if value is not None else default
+
+    def set(self, key, value):
+        self.r.hset(self.hash, key, value)
+
+    def incr(self, key, delta=1, lo=None, hi=None):
+        if lo is None and hi is None:
+            new = self.r.hincrby(self.hash, key, delta)
+            return new - delta, new
+        # clamped: optimistic WATCH/MULTI so it works on plain Redis stand-ins (no Lua needed)
+        out = []
+
+        def go(pipe):
+            value = pipe.hget(self.hash, key)
+            old = int(value) if value is not None else 0
+            new = _clamp(old + delta, lo, hi)
+            pipe.multi()
+            pipe.hset(self.hash, key, new)
+            out[:] = [old, new]
+
+        self.r.transaction(go, self.hash)
+        return out[0], out[1]
+
+    def compare_and_set(self, key, expected, new):
+        ok = []
+
+        def go(pipe):
+            value = pipe.hget(self.hash, key)
+            current = int(value) if value is not None else 0
+            if current != expected:
+                pipe.unwatch()
+                ok[:] = [False]
+                return
+            pipe.multi()
+            pipe.hset(self.hash, key, new)
+            ok[:] = [True]
+
+        self.r.transaction(go, self.hash)
+        return ok[0]
+
+    def snapshot(self):
+        return {k: int(v) for k, v in self.r.hgetall(self.hash).items()}
+
+    def put_record(self, key, record, ttl=None):
+        self.r.set(self._rec(key), json.dumps(record), ex=int(ttl) if ttl else None)
+
+    def get_record(self, key):
+        value = self.r.get(self._rec(key))
+        return json.loads(value) if value is not None else None
+
+    def pop_record(self, key):
+        pipe = self.r.pipeline()
+        pipe.get(self._rec(key))
+        pipe.delete(self._rec(key))
+        value, _ = pipe.execute()
+        return json.loads(value) if value is not None else None
+
+    def count_records(self, prefix):
+        # SCAN walks the keyspace, so keep this to stats/metrics, never the request path
+        return sum(1 for _ in self.r.scan_iter(match=self._rec(prefix) + "*", count=1000))
+
+    # rankings are sorted sets holding -score, so ZRANGE's order (score, then
+    # member) is highest score first with ties by member, as in the other stores
+    def _rank(self, board):
+        return f"{self.prefix}:rank:{board}"
+
+    def rank_add(self, board, member, score):
+        self.r.zadd(self._rank(board), {member: -score}, lt=True)
+
+    def rank_top(self, board, k):
+        return self.r.zrange(self._rank(board), 0, k - 1)
+
+    def rank_of(self, board, member):
+        return self.r.zrank(self._rank(board), member)
+
+    def rank_count(self, board):
+        return self.r.zcard(self._rank(board))
+
+    def rank_trim(self, board, size):
+        over = self.r.zcard(self._rank(board)) - size
+        if over <= 0:
+            return []
+        return [member for member, _ in self.r.zpopmax(self._rank(board), over)]
+
+    def update_record(self, key, fn, ttl=None):
+        rec = self._rec(key)
+        out = []
+
+        def go(pipe):
+            value = pipe.get(rec)
+            record, result = fn(json.loads(value) if value is not None else None)
+            pipe.multi()
+            pipe.set(rec, json.dumps(record), px=max(1, int(ttl * 1000)) if ttl else None)
+            out[:] = [result]
+
+        self.r.transaction(go, rec)
+        return out[0]
+
+
+class RecordMap:
+    """Dict-like view over a store's records under one prefix (used for PUZZLES)."""
+
+    def __init__(self, store, prefix):
+        self.store = store
+        self.prefix = prefix
+
+    def __contains__(self, key):
+        return self.store.get_record(self.prefix + key) is not None
+
+    def __setitem__(self, key, value):
+        self.store.put_record(self.prefix + key, value)
+
+    def get(self, key, default=None):
+        value = self.store.get_record(self.prefix + key)
+        return default if value is None else value
+
+    def pop(self, key, default=None):
+        value = self.store.pop_record(self.prefix + key)
+        return default if value is None else value
+
+
+def make_store(url=None):
+    """Build a store from a STATE_BACKEND style url."""
+    url = url or os.environ.get("STATE_BACKEND", "memory")
+    if url == "memory":
+        return MemoryStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore(url)
+    raise ValueError(f"Unknown STATE_BACKEND: {url}")
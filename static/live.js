@@ -0,0 +1,20 @@
+// Live state: subscribes to the SSE stream and patches every element
+// marked data-live="<state key>" in place. Pages can also listen for the
+// "live:update" event to react to a change (see login.html).
+(function () {
+  if (!window.EventSource) return;
+  var url = document.currentScript.dataset.stream;
+  var source = new EventSource(url);
+
+  function apply(delta) {
+    Object.keys(delta).forEach(function (key) {
+      document.querySelectorAll('[data-live="' + key + '"]').forEach(function (el) {
+        el.textContent = delta[key];
+      });
+    });
+    document.dispatchEvent(new CustomEvent("live:update", { detail: delta }));
+  }
+
+  source.addEventListener("snapshot", function (e) { apply(JSON.parse(e.data)); });
+  source.onmessage = function (e) { apply(JSON.parse(e.data)); };
+})();
@@ -0,0 +1,45 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# app.py reads its settings at import: one in-process game, no cooldown, no limits
+os.environ.pop("STATE_BACKEND", None)
+os.environ.pop("EVENT_LOG_DIR", None)
+os.environ.setdefault("COOLDOWN_SECONDS", "0")
+os.environ.setdefault("RATE_LIMIT", "off")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def game():
+    import app
+    return app
+
+
+@pytest.fixture
+def client(game):
+    return game.app.test_client()
+
+
+@pytest.fixture
+def shared_store(request, tmp_path, monkeypatch):
+    """
+    make() -> a new client of one shared backend (like one more worker).
+    "memory" hands out the same in-process store every time.
+    Redis runs against fakeredis when it is installed (pip install -r requirements-test.txt).
+    """
+    from state_store import MemoryStore, RedisStore, SQLiteStore
+
+    if request.param == "memory":
+        store = MemoryStore()
+        return lambda: store
+    if request.param == "sqlite":
+        path = str(tmp_path / "game.db")
+        return lambda: SQLiteStore(path)
+    fakeredis = pytest.importorskip("fakeredis")
+    import redis
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.Redis, "from_url", lambda url, **kw: fakeredis.FakeRedis(server=server, **kw))
+    return lambda: RedisStore("redis://fake")
@@ -0,0 +1,59 @@
+import pytest
+
+from puzzles import answer_for
+
+
+def new_puzzle(client):
+    return client.post("/api/v1/hack/new", json={}).json["puzzle"]
+
+
+def test_numeric_answer_is_accepted(client):
+    for _ in range(50):
+        puzzle = new_puzzle(client)
+        if puzzle["system"] == "keypad":
+            break
+        client.post("/api/v1/hack/cancel", json={})
+    else:
+        pytest.skip("no keypad puzzle drawn")
+    answer = answer_for(puzzle["desc"])
+    r = client.post("/api/v1/hack/submit", json={"answer": int(answer)})
+    assert r.status_code == 200
+    assert r.json["result"]["ok"]
+
+
+@pytest.mark.parametrize("answer", [16, 1.5, None, True, [1], {"a": 1}])
+def test_odd_answer_types_are_just_wrong(client, answer):
+    new_puzzle(client)
+    r = client.post("/api/v1/hack/submit", json={"answer": answer})
+    assert r.status_code == 200
+    assert "ok" in r.json["result"]
+
+
+@pytest.mark.parametrize("path", ["/api/v1/market/sell", "/api/v1/hack/new", "/api/v1/defender/choose"])
+@pytest.mark.parametrize("body", [[1], "gb", 3, None])
+def test_non_object_json_is_a_400(client, path, body):
+    r = client.post(path, json=body)
+    if body is None:
+        # "null" is no body at all: treated like an empty form
+        assert r.status_code != 500
+    else:
+        assert r.status_code == 400
+        assert "error" in r.json
+
+
+@pytest.mark.parametrize("gb, sold", [
+    ("6", 6), (6, 6), (" 6 ", 6), (3.9, 0), (6.0, 0), ("3.9", 0), (True, 0), ("x", 0), ([6], 0), (None, 0), (-3, 0),
+])
+def test_sell_amount_types(game, client, gb, sold):
+    game.ROOMS.get(game.DEFAULT_ROOM).state.set("files", 10)
+    r = client.post("/api/v1/market/sell", json={"gb": gb})
+    assert r.status_code == 200
+    result = r.json["result"]
+    assert result["sold"] == sold
+    if not sold:
+        assert result["text"] == "Enter a valid amount."
+
+
+def test_numeric_defender_password(client):
+    r = client.post("/api/v1/defender/choose", json={"defense": "keypad", "def_pass": 124578})
+    assert r.json["result"]["ok"]
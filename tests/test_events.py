@@ -0,0 +1,52 @@
+import os
+import sys
+import threading
+
+from events import EventLog, _segments, read_events, restore
+from state_store import MemoryStore
+
+
+def test_concurrent_rooms_log_in_seq_order(tmp_path):
+    log = EventLog(str(tmp_path), flush_interval=60)
+    rooms = []
+    for i in range(8):
+        store = MemoryStore()
+        store.listener = lambda key, value, prefix=f"r{i}/": log.append("test", prefix + key, value)
+        rooms.append(store)
+
+    def play(store):
+        for _ in range(2000):
+            store.incr("files")
+
+    threads = [threading.Thread(target=play, args=(store,)) for store in rooms]
+    interval = sys.getswitchinterval()
+    # switch threads as often as possible so a race shows up
+    sys.setswitchinterval(1e-6)
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+    log.flush()
+
+    seqs = [ev[0] for _, path in _segments(str(tmp_path)) for ev in read_events(path)]
+    assert seqs == list(range(1, 8 * 2000 + 1))
+    assert restore(str(tmp_path))[1] == {f"r{i}/files": 2000 for i in range(8)}
+
+
+def test_forked_copy_refuses_to_write(tmp_path):
+    log = EventLog(str(tmp_path), flush_interval=60)
+    log.append("test", "files", 1)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            log.append("test", "files", 2)
+        except RuntimeError:
+            os._exit(0)
+        os._exit(1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    log.flush()
+    assert restore(str(tmp_path)) == (1, {"files": 1})
@@ -0,0 +1,105 @@
+import pytest
+
+from leaderboard import Leaderboard, SharedLeaderboard
+
+SHARED = pytest.mark.parametrize("shared_store", ["sqlite", "redis"], indirect=True)
+
+
+def test_ranks_by_intel_then_credits():
+    board = Leaderboard(k=2)
+    board.record("a", "alice", intel=10)
+    board.record("b", "bob", intel=10, credits=3)
+    board.record("c", "carol", intel=5)
+    assert [row["name"] for row in board.top()] == ["bob", "alice"]
+    assert board.player("c")[0] == 3
+    assert board.player("nobody") == (None, None)
+
+
+@SHARED
+def test_workers_share_accounts(shared_store):
+    # two workers: separate processes in production, separate clients here
+    one = SharedLeaderboard(shared_store(), k=10, refresh=0)
+    two = SharedLeaderboard(shared_store(), k=10, refresh=0)
+    one.record("p1", "neo", intel=30, system="wires", success=True)
+    two.record("p1", "neo", intel=7, system="wires", success=True)
+    two.record("p2", "trinity", intel=20)
+
+    for board in (one, two):
+        assert len(board) == 2
+        rank, me = board.player("p1")
+        assert rank == 1
+        assert me["intel"] == 37
+        assert me["systems"] == {"wires": {"success": 2, "fail": 0}}
+        assert [row["name"] for row in board.top()] == ["neo", "trinity"]
+
+
+@SHARED
+def test_accounts_survive_a_restart(shared_store):
+    SharedLeaderboard(shared_store(), refresh=0).record("p1", "neo", intel=12)
+    board = SharedLeaderboard(shared_store(), refresh=0)
+    assert board.player("p1")[1]["intel"] == 12
+
+
+@SHARED
+def test_rename_only_touches_existing_accounts(shared_store):
+    board = SharedLeaderboard(shared_store(), refresh=0)
+    board.rename("ghost", "boo")
+    assert len(board) == 0
+    board.record("p1", "neo", intel=1)
+    version = board.version
+    board.rename("p1", "the one")
+    assert board.top()[0]["name"] == "the one"
+    assert board.version > version
+
+
+@SHARED
+def test_shared_ranking_matches_the_local_one(shared_store):
+    local = Leaderboard(k=5)
+    shared = SharedLeaderboard(shared_store(), k=5, refresh=0)
+    events = [("p%d" % (i % 13), (i * 7) % 11, (i * 5) % 3) for i in range(200)]
+    for pid, intel, credits in events:
+        for board in (local, shared):
+            board.record(pid, pid, intel=intel, credits=credits)
+    assert shared.top() == local.top()
+    assert len(shared) == len(local)
+    for pid in {pid for pid, _, _ in events}:
+        assert shared.player(pid) == local.player(pid)
+
+
+@SHARED
+def test_top_is_cached_between_refreshes(shared_store):
+    board = SharedLeaderboard(shared_store(), k=5, refresh=60)
+    board.record("p1", "neo", intel=5)
+    assert board.top()[0]["name"] == "neo"
+    board.record("p2", "trinity", intel=50)
+    assert board.top()[0]["name"] == "neo"
+    # but a viewer's own rank is always current
+    assert board.player("p2")[0] == 1
+
+
+def test_local_board_is_bounded():
+    board = Leaderboard(k=2, max_players=5)
+    board.record("top", "top", intel=100)
+    for i in range(1000):
+        board.record(f"p{i:04d}", "drifter", system="wires", success=False)
+    board.record("second", "second", intel=50)
+    assert len(board) == 5
+    assert [row["name"] for row in board.top()] == ["top", "second"]
+    assert board.dropped == 1000 + 2 - 5
+    assert board.player("top")[0] == 1
+
+
+@SHARED
+def test_shared_board_is_bounded(shared_store):
+    store = shared_store()
+    board = SharedLeaderboard(store, k=2, refresh=0, max_players=5)
+    board.record("top", "top", intel=100)
+    for i in range(SharedLeaderboard.TRIM_EVERY * 2):
+        board.record(f"p{i:04d}", "drifter", system="wires", success=False)
+    board.trim()
+    assert len(board) == 5
+    assert store.get_record("player:top") is not None
+    # ties rank by id, so the last ids go first
+    assert store.get_record("player:p0000") is not None
+    assert store.get_record(f"player:p{SharedLeaderboard.TRIM_EVERY * 2 - 1:04d}") is None
+    assert board.top()[0]["name"] == "top"
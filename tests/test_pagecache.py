@@ -0,0 +1,23 @@
+def files_on_page(client, room):
+    return client.get(f"/system?room={room}").get_data(as_text=True)
+
+
+def test_rebuilt_room_does_not_serve_its_old_pages(game, client):
+    room = "evicted-room"
+    before = files_on_page(client, room)
+    game.ROOMS.get(room).state.set("files", 24)
+    changed = files_on_page(client, room)
+    assert changed != before
+
+    # evict and rebuild: the new store starts over, the cached pages don't
+    with game.ROOMS._lock:
+        del game.ROOMS._rooms[room]
+    rebuilt = game.ROOMS.get(room)
+    rebuilt.state.set("files", 7)
+    assert files_on_page(client, room) not in (before, changed)
+
+
+def test_repeat_view_is_a_304(client):
+    first = client.get("/system")
+    again = client.get("/system", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
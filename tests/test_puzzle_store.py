@@ -0,0 +1,96 @@
+import pytest
+
+from puzzle_store import PuzzleStore
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def test_expires_after_ttl(clock):
+    store = PuzzleStore(ttl=10, tick=1, clock=clock)
+    store["a"] = {"x": 1}
+    clock.now += 9.9
+    assert store.get("a") == {"x": 1}
+    clock.now += 0.2
+    assert "a" not in store
+    assert store.stats()["expirations"] == 1
+
+
+@pytest.mark.parametrize("gap", [11, 12, 13, 50, 1000.25, 10 ** 6])
+def test_long_idle_gap_expires_everything(clock, gap):
+    store = PuzzleStore(ttl=10, tick=1, clock=clock)
+    for i in range(100):
+        clock.now += 0.07
+        store[f"t{i}"] = {"i": i}
+    clock.now += gap
+    # one sweep after the gap, without touching any token first
+    assert len(store) == 0
+    stats = store.stats()
+    assert stats["expirations"] == 100
+    assert stats["approx_bytes"] == 0
+
+
+@pytest.mark.parametrize("gap", [12, 1000, 1000.5])
+def test_wheel_keeps_working_after_a_gap(clock, gap):
+    store = PuzzleStore(ttl=10, tick=1, clock=clock)
+    store["old"] = {}
+    clock.now += gap
+    store["new"] = {}
+    clock.now += 9.5
+    assert "new" in store
+    assert "old" not in store
+    clock.now += 0.6
+    assert "new" not in store
+    clock.now += 1
+    assert len(store) == 0
+
+
+def test_len_lags_by_at_most_one_tick(clock):
+    store = PuzzleStore(ttl=10, tick=1, clock=clock)
+    store["a"] = {}
+    clock.now += 10.5
+    # expired inside the current tick: still counted, but never handed out
+    assert len(store) == 1
+    assert "a" not in store
+    assert len(store) == 0
+
+
+def test_readded_token_outlives_its_old_slot(clock):
+    store = PuzzleStore(ttl=10, tick=1, clock=clock)
+    store["a"] = {"v": 1}
+    clock.now += 6
+    store["a"] = {"v": 2}
+    # past the first expiry: the old slot is swept, the token is not
+    clock.now += 6
+    assert len(store) == 1
+    assert store.get("a") == {"v": 2}
+    clock.now += 5
+    assert store.get("a") is None
+
+
+def test_lru_eviction(clock):
+    store = PuzzleStore(ttl=10, max_size=2, tick=1, clock=clock)
+    store["a"] = {}
+    store["b"] = {}
+    store.get("a")
+    store["c"] = {}
+    assert "b" not in store
+    assert "a" in store and "c" in store
+    assert store.stats()["evictions"] == 1
+
+
+def test_pop_removes_once(clock):
+    store = PuzzleStore(ttl=10, tick=1, clock=clock)
+    store["a"] = {"x": 1}
+    assert store.pop("a") == {"x": 1}
+    assert store.pop("a", "gone") == "gone"
@@ -0,0 +1,134 @@
+import random
+
+import pytest
+
+from ratelimit import LocalBuckets, RateLimiter, SlidingWindow, TokenBucket, make_limiter
+from state_store import MemoryStore
+
+
+def hits(policy, times, state=None):
+    waits = []
+    for now in times:
+        state, wait = policy.hit(state, now)
+        waits.append(wait)
+    return state, waits
+
+
+def test_token_bucket_burst_then_rate():
+    bucket = TokenBucket(rate=2, burst=3)
+    state, waits = hits(bucket, [0, 0, 0, 0])
+    assert waits[:3] == [0, 0, 0]
+    assert waits[3] == pytest.approx(0.5)
+    # a denied hit doesn't spend anything
+    assert bucket.wait(state, 0.25) == pytest.approx(0.25)
+    assert bucket.hit(state, 0.5)[1] == 0
+
+
+def test_token_bucket_refills_to_burst_only():
+    bucket = TokenBucket(rate=2, burst=3)
+    state, _ = hits(bucket, [0, 0, 0])
+    _, waits = hits(bucket, [1000] * 4, state)
+    assert waits == [0, 0, 0, pytest.approx(0.5)]
+    assert bucket.ttl == 1.5
+
+
+def test_sliding_window_weights_the_previous_window():
+    window = SlidingWindow(limit=10, window=60)
+    state, waits = hits(window, [0] * 10)
+    assert waits == [0] * 10
+    # full on its own: the next window, then until 9 of the 10 have slid out
+    state, wait = window.hit(state, 1)
+    assert wait == pytest.approx(65)
+    assert window.wait(state, 65.9) > 0
+    assert window.wait(state, 66) == 0
+
+
+def test_sliding_window_waits_for_the_previous_window_to_slide_out():
+    window = SlidingWindow(limit=10, window=60)
+    state, _ = hits(window, [59] * 10)
+    # at t=70 the previous window still counts as 10 * 50/60 = 8.33: one more fits, a second once it is down to 8
+    state, waits = hits(window, [70, 70], state)
+    assert waits[0] == 0
+    assert waits[1] == pytest.approx(60 * (1 - 8 / 10) + 60 - 70)
+    assert window.wait(state, 72) == 0
+
+
+def test_sliding_window_forgets_after_two_windows():
+    window = SlidingWindow(limit=1, window=10)
+    state, _ = hits(window, [0])
+    assert window.wait(state, 20) == 0
+    assert window.ttl == 20
+
+
+@pytest.mark.parametrize("policy", [
+    TokenBucket(rate=5, burst=20), TokenBucket(rate=0.1, burst=1),
+    SlidingWindow(limit=10, window=60), SlidingWindow(limit=3, window=1),
+])
+def test_reported_wait_is_exact(policy):
+    """Retrying after the reported wait succeeds; retrying noticeably earlier doesn't."""
+    rng = random.Random(7)
+    state, now = None, 1000.0
+    for _ in range(2000):
+        now += rng.expovariate(1.0) * rng.choice([0.01, 0.1, 1, 10])
+        state, wait = policy.hit(state, now)
+        if wait:
+            assert policy.wait(state, now + wait + 1e-6) == 0
+            if wait > 1e-3:
+                assert policy.wait(state, now + wait - 1e-3) > 0
+
+
+def test_limiter_keys_are_independent():
+    policies = {"hack": TokenBucket(rate=1, burst=1)}
+    clock = [0.0]
+    limiter = RateLimiter(policies, LocalBuckets(policies), clock=lambda: clock[0])
+    assert limiter.hit("hack", "a") == 0
+    assert limiter.hit("hack", "a") == pytest.approx(1)
+    assert limiter.hit("hack", "b") == 0
+    clock[0] = 1.0
+    assert limiter.wait("hack", "a") == 0
+
+
+def cooldown(game, monkeypatch, per_address):
+    policies = dict(game.RATE_POLICIES, cooldown=TokenBucket(rate=per_address / 10, burst=per_address))
+    if per_address > 1:
+        policies["cooldown_player"] = TokenBucket(rate=1 / 10, burst=1)
+    monkeypatch.setattr(game, "LIMITER", make_limiter(MemoryStore(), policies))
+    monkeypatch.setattr(game, "COOLDOWN_SECONDS", 10)
+    monkeypatch.setattr(game, "COOLDOWN_PER_ADDRESS", per_address)
+
+
+def cancel(client):
+    client.post("/api/v1/hack/new", json={})
+    client.post("/api/v1/hack/cancel", json={})
+
+
+def test_new_cookie_does_not_skip_the_cooldown(game, monkeypatch):
+    cooldown(game, monkeypatch, per_address=1)
+    one = game.app.test_client()
+    cancel(one)
+    assert one.get("/api/v1/state").json["cooldown"] == 10
+    # same address, no cookie: still cooling down
+    fresh = game.app.test_client()
+    assert fresh.get("/api/v1/state").json["cooldown"] == 10
+    r = fresh.post("/api/v1/hack/new", json={})
+    assert r.json["puzzle"] is None
+    assert r.json["result"]["msg"].startswith("Cooldown active")
+
+
+def test_players_behind_one_address_share_its_budget(game, monkeypatch):
+    cooldown(game, monkeypatch, per_address=2)
+    # test clients all come from 127.0.0.1, like players behind one NAT
+    one, two = game.app.test_client(), game.app.test_client()
+    cancel(one)
+    assert one.get("/api/v1/state").json["cooldown"] == 10
+    assert two.post("/api/v1/hack/new", json={}).json["puzzle"] is not None
+    two.post("/api/v1/hack/cancel", json={})
+    # the address has used both of its hacks: a new cookie doesn't get a third
+    fresh = game.app.test_client()
+    assert fresh.post("/api/v1/hack/new", json={}).json["puzzle"] is None
+
+
+def test_every_limited_endpoint_exists(game):
+    # a misspelt endpoint name would switch its limit off without any error
+    assert set(game.RATE_LIMITED) <= set(game.app.view_functions)
+    assert set(game.RATE_LIMITED.values()) <= set(game.RATE_POLICIES)
@@ -0,0 +1,92 @@
+import types
+
+import pytest
+
+import rooms
+from ratelimit import make_limiter
+from rooms import DEFAULT_ROOM, RoomRegistry, RoomsFull
+from state_store import MemoryStore
+
+
+class Clock:
+    now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rooms.time, "monotonic", clock)
+
+    def factory(room_id):
+        return types.SimpleNamespace(id=room_id, last_used=0, live=types.SimpleNamespace(_subscribers=0))
+
+    return RoomRegistry(factory, idle_ttl=60, max_rooms=2), clock
+
+
+def test_busy_rooms_are_not_evicted_to_make_space(registry):
+    reg, clock = registry
+    a, b = reg.get("a"), reg.get("b")
+    clock.now += 30
+    with pytest.raises(RoomsFull):
+        reg.get("c")
+    assert reg.get("a") is a and reg.get("b") is b
+    assert reg.evictions == 0
+
+
+def test_main_room_always_opens(registry):
+    reg, _ = registry
+    reg.get("a")
+    reg.get("b")
+    assert reg.get(DEFAULT_ROOM).id == DEFAULT_ROOM
+
+
+def test_idle_room_makes_space(registry):
+    reg, clock = registry
+    reg.get("a")
+    clock.now += 30
+    reg.get("b")
+    clock.now += 31
+    assert reg.get("c").id == "c"
+    assert reg.get("a", create=False) is None
+    assert reg.evictions == 1
+
+
+def test_watched_room_is_kept(registry):
+    reg, clock = registry
+    reg.get("a").live._subscribers = 1
+    reg.get("b")
+    clock.now += 61
+    reg.get("c")
+    assert reg.get("a", create=False) is not None
+    assert reg.get("b", create=False) is None
+
+
+def test_get_without_create(registry):
+    reg, _ = registry
+    assert reg.get("a", create=False) is None
+    assert len(reg) == 0
+
+
+def test_opening_rooms_is_rate_limited(game, monkeypatch):
+    monkeypatch.setattr(game, "RATE_LIMIT", True)
+    monkeypatch.setattr(game, "LIMITER", make_limiter(MemoryStore(), game.RATE_POLICIES))
+    client = game.app.test_client()
+    burst = game.RATE_POLICIES["room"].burst
+    for i in range(burst):
+        assert client.get(f"/api/v1/state?room=limited-{i}").status_code == 200
+    r = client.get("/api/v1/state?room=limited-new")
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) > 0
+    # rooms that are already open can still be joined
+    assert client.get("/api/v1/state?room=limited-0").json["room"] == "limited-0"
+
+
+def test_full_registry_refuses_new_rooms(game, monkeypatch):
+    monkeypatch.setattr(game.ROOMS, "max_rooms", len(game.ROOMS))
+    client = game.app.test_client()
+    r = client.get("/api/v1/state?room=one-too-many")
+    assert r.status_code == 503
+    assert client.get("/api/v1/state").json["room"] == DEFAULT_ROOM
@@ -0,0 +1,71 @@
+from puzzle_store import PuzzleStore
+from sessions import SID_RE, ServerSessionInterface
+
+PLANTED = "A" * 32
+LOGIN = {"defense": "keypad", "def_pass": "124578"}
+
+
+def cookie(game, client):
+    c = client.get_cookie(game.app.config["SESSION_COOKIE_NAME"])
+    return c.value if c else None
+
+
+def test_new_session_gets_a_random_id(game, client):
+    client.post("/leaderboard", data={"handle": "neo"})
+    sid = cookie(game, client)
+    assert sid and SID_RE.match(sid)
+
+
+def test_unknown_id_is_not_adopted(game, client):
+    client.set_cookie(game.app.config["SESSION_COOKIE_NAME"], PLANTED)
+    client.post("/leaderboard", data={"handle": "neo"})
+    assert cookie(game, client) != PLANTED
+    assert PLANTED not in game.app.session_interface.store
+
+
+def test_planted_id_does_not_share_a_login(game):
+    name = game.app.config["SESSION_COOKIE_NAME"]
+    victim, attacker = game.app.test_client(), game.app.test_client()
+    victim.set_cookie(name, PLANTED)
+    attacker.set_cookie(name, PLANTED)
+    r = victim.post("/api/v1/defender/choose", json=LOGIN)
+    assert r.json["result"]["ok"]
+    assert victim.get("/api/v1/state").json["admin_scope"] == "keypad"
+    assert attacker.get("/api/v1/state").json["admin_scope"] is None
+
+
+def test_login_rotates_the_id(game, client):
+    client.post("/leaderboard", data={"handle": "neo"})
+    before = cookie(game, client)
+    client.post("/api/v1/defender/choose", json=LOGIN)
+    after = cookie(game, client)
+    store = game.app.session_interface.store
+    assert after != before
+    assert before not in store
+    assert store.get(after)["admin_scope"] == "keypad"
+    assert store.get(after)["handle"] == "neo"
+
+
+def test_read_only_request_sets_no_cookie(game, client):
+    client.post("/leaderboard", data={"handle": "neo"})
+    r = client.get("/api/v1/state")
+    assert "Set-Cookie" not in r.headers
+
+
+def test_emptied_session_is_dropped():
+    store = PuzzleStore(ttl=60)
+    interface = ServerSessionInterface(store)
+    sid = "B" * 32
+    store[sid] = {"x": 1}
+
+    class Request:
+        cookies = {"session": sid}
+
+    from flask import Flask, Response
+    app = Flask(__name__)
+    session = interface.open_session(app, Request)
+    session.clear()
+    response = Response()
+    interface.save_session(app, session, response)
+    assert sid not in store
+    assert "session=;" in response.headers["Set-Cookie"]
@@ -0,0 +1,185 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from state_store import SQLiteStore
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BACKENDS = pytest.mark.parametrize("shared_store", ["memory", "sqlite", "redis"], indirect=True)
+SHARED = pytest.mark.parametrize("shared_store", ["sqlite", "redis"], indirect=True)
+
+
+@BACKENDS
+def test_incr_clamps_and_returns_old_and_new(shared_store):
+    store = shared_store()
+    store.seed({"detection": 3, "credits": 1})
+    store.seed({"detection": 99})  # existing values are kept
+    assert store.incr("detection") == (3, 4)
+    assert store.incr("detection", 5, hi=5) == (4, 5)
+    assert store.incr("credits", -4, lo=0) == (1, 0)
+    assert store.incr("missing", 2) == (0, 2)
+    assert store.snapshot() == {"detection": 5, "credits": 0, "missing": 2}
+
+
+@BACKENDS
+def test_compare_and_set(shared_store):
+    store = shared_store()
+    store.set("files", 2)
+    assert not store.compare_and_set("files", 1, 10)
+    assert store.get("files") == 2
+    assert store.compare_and_set("files", 2, 10)
+    assert store.get("files") == 10
+    # a missing counter counts as 0
+    assert store.compare_and_set("new", 0, 7)
+    assert store["new"] == 7
+
+
+@BACKENDS
+def test_spend_under_contention(shared_store):
+    shared_store().set("credits", 100)
+    won = []
+
+    def player():
+        store = shared_store()
+        won.append(sum(store.spend("credits", 3) for _ in range(10)))
+
+    threads = [threading.Thread(target=player) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 33 spends of 3 fit in 100, and none may go through twice or overdraw
+    assert sum(won) == 33
+    assert shared_store().get("credits") == 1
+    assert not shared_store().spend("credits", 3)
+
+
+@BACKENDS
+def test_concurrent_clamped_incr_loses_nothing(shared_store):
+    def worker():
+        store = shared_store()
+        for _ in range(25):
+            store.incr("detection", 1, hi=150)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert shared_store().get("detection") == 150
+
+
+@BACKENDS
+def test_namespaces_are_isolated(shared_store):
+    main = shared_store()
+    main.set("credits", 5)
+    main.put_record("puzzle:a", {"room": "main"})
+    room = main.namespace("alpha")
+    other = main.namespace("beta")
+    room.incr("credits", 2)
+    room.put_record("puzzle:a", {"room": "alpha"})
+    room.rank_add("leaderboard", "p1", 10)
+
+    assert main.get("credits") == 5
+    assert room.get("credits") == 2
+    assert other.get("credits") == 0
+    assert main.get_record("puzzle:a") == {"room": "main"}
+    assert room.get_record("puzzle:a") == {"room": "alpha"}
+    assert other.get_record("puzzle:a") is None
+    assert room.rank_top("leaderboard", 5) == ["p1"]
+    assert main.rank_count("leaderboard") == 0
+    assert room.snapshot() == {"credits": 2}
+
+
+@SHARED
+def test_same_room_is_shared_between_clients(shared_store):
+    shared_store().namespace("alpha").set("files", 4)
+    assert shared_store().namespace("alpha").get("files") == 4
+
+
+def test_sqlite_main_snapshot_skips_rooms(tmp_path):
+    store = SQLiteStore(str(tmp_path / "game.db"))
+    store.seed({"detection": 1, "files": 0})
+    store.namespace("alpha").seed({"detection": 4})
+    store.namespace("alphabet").set("files", 9)
+    assert store.snapshot() == {"detection": 1, "files": 0}
+    assert store.namespace("alpha").snapshot() == {"detection": 4}
+
+
+@BACKENDS
+def test_records_and_update_record(shared_store):
+    store = shared_store()
+    store.put_record("session:a", {"n": 1})
+    store.put_record("session:b", {"n": 2})
+    store.put_record("puzzle:c", {"n": 3})
+    assert store.get_record("session:a") == {"n": 1}
+    assert store.count_records("session:") == 2
+    assert store.pop_record("session:a") == {"n": 1}
+    assert store.pop_record("session:a") is None
+
+    def bump(record):
+        record = record or {"n": 0}
+        return {"n": record["n"] + 1}, record["n"]
+
+    assert store.update_record("session:b", bump) == 2
+    assert store.update_record("session:new", bump) == 0
+    assert store.get_record("session:b") == {"n": 3}
+
+
+@pytest.mark.parametrize("shared_store", ["memory", "sqlite"], indirect=True)
+def test_records_expire(shared_store, monkeypatch):
+    store = shared_store()
+    store.put_record("limit:a", {"n": 1}, ttl=30)
+    store.put_record("limit:b", {"n": 2})
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 31)
+    assert store.get_record("limit:a") is None
+    assert store.pop_record("limit:a") is None
+    assert store.get_record("limit:b") == {"n": 2}
+
+
+@BACKENDS
+def test_rankings(shared_store):
+    store = shared_store()
+    for member, score in [("b", 5), ("a", 5), ("c", 9), ("d", 1)]:
+        store.rank_add("board", member, score)
+    store.rank_add("board", "d", 0)  # never lowered
+    assert store.rank_top("board", 3) == ["c", "a", "b"]
+    assert [store.rank_of("board", m) for m in "abcd"] == [1, 2, 0, 3]
+    assert store.rank_of("board", "nobody") is None
+    store.rank_add("board", "d", 7)
+    assert store.rank_top("board", 10) == ["c", "d", "a", "b"]
+    assert store.rank_trim("board", 2) == ["b", "a"]
+    assert store.rank_trim("board", 2) == []
+    assert store.rank_count("board") == 2
+
+
+STRESS = """
+import sys
+from state_store import SQLiteStore
+store = SQLiteStore(sys.argv[1])
+spent = 0
+for _ in range(100):
+    store.incr("detection", 1, hi=250)
+    spent += store.spend("credits", 1)
+print(spent)
+"""
+
+
+def test_sqlite_stress_across_processes(tmp_path):
+    path = str(tmp_path / "game.db")
+    SQLiteStore(path).seed({"detection": 0, "credits": 300})
+    procs = [
+        subprocess.Popen([sys.executable, "-c", STRESS, path], cwd=ROOT, stdout=subprocess.PIPE, text=True)
+        for _ in range(4)
+    ]
+    spent = [int(p.communicate(timeout=60)[0]) for p in procs]
+    assert all(p.returncode == 0 for p in procs)
+    store = SQLiteStore(path)
+    assert store.get("detection") == 250
+    assert sum(spent) == 300
+    assert store.get("credits") == 0